@@ -5,17 +5,16 @@ API接口测试基础工具类
 """
 
 import json
-import re
 from json.decoder import JSONDecodeError
 
-import allure
-import jsonpath
-
+from base.caseplan import plan_cache, compile_extract_rules, match_jsonpath_rules, parse_cookies
+from common.allureattach import attach_policy, LABEL, BODY
 from common.assertions import Assertions
-from common.debugtalk import DebugTalk
+from common.debugtalk import function_registry
 from common.readyaml import get_testcase_yaml, ReadYamlData
 from common.recordlog import logs
 from common.sendrequest import SendRequest
+from common.template import render, stringify_values
 from conf.operationConfig import OperationConfig
 from conf.setting import FILE_PATH
 
@@ -44,7 +43,8 @@ class RequestBase:
     def replace_load(self, data):
         """
         YAML数据动态替换解析
-        功能：将YAML文件中的${函数名(参数)}格式的字符串替换为实际值
+        功能：将YAML文件中的${函数名(参数)}格式的字符串替换为实际值，
+             数据只编译一次模板并按节点缓存，整个字符串为占位符时保留返回值的原始类型
         
         Args:
             data: 需要替换的数据，可以是字符串、字典或列表
@@ -52,33 +52,96 @@ class RequestBase:
         Returns:
             替换后的数据
         """
-        str_data = data
-        if not isinstance(data, str):
-            str_data = json.dumps(data, ensure_ascii=False)
-            # print('从yaml文件获取的原始数据：', str_data)
-        for i in range(str_data.count('${')):
-            if '${' in str_data and '}' in str_data:
-                start_index = str_data.index('$')
-                end_index = str_data.index('}', start_index)
-                ref_all_params = str_data[start_index:end_index + 1]
-                # 取出yaml文件的函数名
-                func_name = ref_all_params[2:ref_all_params.index("(")]
-                # 取出函数里面的参数
-                func_params = ref_all_params[ref_all_params.index("(") + 1:ref_all_params.index(")")]
-                # 传入替换的参数获取对应的值,类的反射----getattr,setattr,del....
-                extract_data = getattr(DebugTalk(), func_name)(*func_params.split(',') if func_params else "")
-
-                if extract_data and isinstance(extract_data, list):
-                    extract_data = ','.join(e for e in extract_data)
-                str_data = str_data.replace(ref_all_params, str(extract_data))
-                # print('通过解析后替换的数据：', str_data)
-
-        # 还原数据
-        if data and isinstance(data, dict):
-            data = json.loads(str_data)
-        else:
-            data = str_data
-        return data
+        return render(data, function_registry.resolve)
+
+    def prepare_request(self, base_info, test_case):
+        """
+        根据用例执行计划生成接口请求信息
+        功能：用例首次执行时编译为执行计划并缓存，之后每次只渲染请求头、Cookie、断言和请求参数中的动态数据，
+             不修改YAML用例数据，同一条用例可以重复执行
+
+        Args:
+            base_info (dict): YAML文件中的baseInfo部分，包含接口基本信息
+            test_case (dict): YAML文件中的testCase部分，包含测试用例数据
+
+        Returns:
+            dict: 接口请求信息，request为发送请求时的参数（data、json、params等）
+        """
+        resolver = function_registry.resolve
+        plan = plan_cache.get(base_info, test_case, self.conf.get_section_for_data('api_envi', 'host'))
+        request = dict(plan.static_params)
+        for key, node in plan.params:
+            request[key] = node.render(resolver)
+
+        # 处理文件上传接口
+        files = None
+        if plan.file is not None:
+            for fk, fv in plan.file.items():
+                files = {fk: open(fv, mode='rb')}
+
+        return {
+            'api_name': plan.api_name,
+            'url': plan.url,
+            'method': plan.method,
+            'header': stringify_values(plan.header.render(resolver)),
+            'cookies': None if plan.cookies is None else parse_cookies(plan.cookies.render(resolver)),
+            'case_name': plan.case_name,
+            'validation': plan.validation.render(resolver),
+            'extract': plan.extract,
+            'extract_list': plan.extract_list,
+            'file': plan.file,
+            'files': files,
+            'request': request
+        }
+
+    def attach_request(self, case, with_params=False):
+        """
+        将接口请求信息写入Allure报告，写入方式由ALLURE_ATTACH_MODE决定
+
+        Args:
+            case (dict): prepare_request返回的接口请求信息
+            with_params (bool): 是否同时写入请求参数，run_main发送请求时会自行写入
+        """
+        if not attach_policy.enabled:
+            return
+        api_name = case['api_name']
+        attach_policy.attach(api_name, f'接口名称：{api_name}', kind=LABEL)
+        attach_policy.attach(api_name, f'接口地址：{case["url"]}', kind=LABEL)
+        attach_policy.attach(api_name, f'请求方法：{case["method"]}', kind=LABEL)
+        attach_policy.attach(api_name, f'请求头：{case["header"]}', kind=LABEL)
+        attach_policy.attach(api_name, f'测试用例名称：{case["case_name"]}', kind=LABEL)
+        if case['file'] is not None:
+            attach_policy.attach(json.dumps(case['file']), '导入文件')
+        if with_params and case['request']:
+            attach_policy.attach(json.dumps(case['request'], ensure_ascii=False), '请求参数', kind=BODY)
+
+    def handle_response(self, case, res):
+        """
+        处理接口响应
+        功能：将响应信息写入Allure报告，提取接口返回值，执行断言
+
+        Args:
+            case (dict): prepare_request返回的接口请求信息
+            res (ApiResponse): 接口响应对象
+
+        Returns:
+            None
+        """
+        status_code = res.status_code
+        try:
+            res_json = res.json_data  # 响应体只解析一次，报告、提取和断言共用
+            logs.debug('响应体解析耗时：%sms', res.decode_ms)
+            if attach_policy.enabled:
+                attach_policy.attach(self.allure_attach_response(res_json), '接口响应信息', kind=BODY)
+            self.apply_extract_rules(case['extract'] + case['extract_list'], res.text, res_json)
+            # 处理断言
+            self.asserts.assert_result(case['validation'], res_json, status_code)
+        except JSONDecodeError as js:
+            logs.error('系统异常或接口未请求！')
+            raise js
+        except Exception as e:
+            logs.error(e)
+            raise e
 
     def specification_yaml(self, base_info, test_case):
         """
@@ -92,64 +155,13 @@ class RequestBase:
         Returns:
             None
         """
-        try:
-            params_type = ['data', 'json', 'params']
-            url_host = self.conf.get_section_for_data('api_envi', 'host')
-            api_name = base_info['api_name']
-            allure.attach(api_name, f'接口名称：{api_name}', allure.attachment_type.TEXT)
-            url = url_host + base_info['url']
-            allure.attach(api_name, f'接口地址：{url}', allure.attachment_type.TEXT)
-            method = base_info['method']
-            allure.attach(api_name, f'请求方法：{method}', allure.attachment_type.TEXT)
-            header = self.replace_load(base_info['header'])
-            allure.attach(api_name, f'请求头：{header}', allure.attachment_type.TEXT)
-            # 处理cookie
-            cookie = None
-            if base_info.get('cookies') is not None:
-                cookie = eval(self.replace_load(base_info['cookies']))
-            case_name = test_case.pop('case_name')
-            allure.attach(api_name, f'测试用例名称：{case_name}', allure.attachment_type.TEXT)
-            # 处理断言
-            val = self.replace_load(test_case.get('validation'))
-            test_case['validation'] = val
-            validation = eval(test_case.pop('validation'))
-            # 处理参数提取
-            extract = test_case.pop('extract', None)
-            extract_list = test_case.pop('extract_list', None)
-            # 处理接口的请求参数
-            for key, value in test_case.items():
-                if key in params_type:
-                    test_case[key] = self.replace_load(value)
-
-            # 处理文件上传接口
-            file, files = test_case.pop('files', None), None
-            if file is not None:
-                for fk, fv in file.items():
-                    allure.attach(json.dumps(file), '导入文件')
-                    files = {fk: open(fv, mode='rb')}
-
-            res = self.run.run_main(name=api_name, url=url, case_name=case_name, header=header, method=method,
-                                    file=files, cookies=cookie, **test_case)
-            status_code = res.status_code
-            allure.attach(self.allure_attach_response(res.json()), '接口响应信息', allure.attachment_type.TEXT)
-
-            try:
-                res_json = json.loads(res.text)  # 把json格式转换成字典字典
-                if extract is not None:
-                    self.extract_data(extract, res.text)
-                if extract_list is not None:
-                    self.extract_data_list(extract_list, res.text)
-                # 处理断言
-                self.asserts.assert_result(validation, res_json, status_code)
-            except JSONDecodeError as js:
-                logs.error('系统异常或接口未请求！')
-                raise js
-            except Exception as e:
-                logs.error(e)
-                raise e
-
-        except Exception as e:
-            raise e
+        case = self.prepare_request(base_info, test_case)
+        with attach_policy.case():
+            self.attach_request(case)
+            res = self.run.run_main(name=case['api_name'], url=case['url'], case_name=case['case_name'],
+                                    header=case['header'], method=case['method'], file=case['files'],
+                                    cookies=case['cookies'], **case['request'])
+            self.handle_response(case, res)
 
     @classmethod
     def allure_attach_response(cls, response):
@@ -162,12 +174,45 @@ class RequestBase:
         Returns:
             str: 格式化后的响应数据字符串
         """
-        if isinstance(response, dict):
+        if isinstance(response, (dict, list)):
             allure_response = json.dumps(response, ensure_ascii=False, indent=4)
         else:
             allure_response = response
         return allure_response
 
+    def apply_extract_rules(self, rules, response, response_json=None):
+        """
+        按编译好的提取规则提取接口返回值并写入extract.yaml
+
+        Args:
+            rules (tuple): ExtractRule元组
+            response (str): 接口的实际响应文本
+            response_json: 已解析的响应数据，为None时按需解析
+
+        Returns:
+            None
+        """
+        try:
+            matches = match_jsonpath_rules(rules, response, response_json)
+        except Exception:
+            # 响应不是JSON时，JSONPath规则逐条提取并记录异常
+            matches = {}
+        for rule in rules:
+            try:
+                if rule in matches:
+                    value = rule.pick(matches[rule])
+                else:
+                    value = rule.extract(response, response_json)
+                if value is None:
+                    if rule.kind == 'regex':
+                        continue
+                    value = '未提取到数据，该接口返回结果可能为空'
+                extract_data = {rule.key: value}
+                logs.info('提取接口的返回值：%s', extract_data)
+                self.read.write_yaml_data(extract_data)
+            except Exception as e:
+                logs.error('接口返回值提取异常，请检查yaml文件提取表达式【%s】是否正确！%s', rule.key, e)
+
     def extract_data(self, testcase_extarct, response):
         """
         提取接口返回值（单个参数）
@@ -180,30 +225,7 @@ class RequestBase:
         Returns:
             None: 提取的数据会写入extract.yaml文件
         """
-        try:
-            pattern_lst = ['(.*?)', '(.+?)', r'(\d)', r'(\d*)']
-            for key, value in testcase_extarct.items():
-
-                # 处理正则表达式提取
-                for pat in pattern_lst:
-                    if pat in value:
-                        ext_lst = re.search(value, response)
-                        if pat in [r'(\d+)', r'(\d*)']:
-                            extract_data = {key: int(ext_lst.group(1))}
-                        else:
-                            extract_data = {key: ext_lst.group(1)}
-                        self.read.write_yaml_data(extract_data)
-                # 处理json提取参数
-                if '$' in value:
-                    ext_json = jsonpath.jsonpath(json.loads(response), value)[0]
-                    if ext_json:
-                        extarct_data = {key: ext_json}
-                        logs.info('提取接口的返回值：', extarct_data)
-                    else:
-                        extarct_data = {key: '未提取到数据，请检查接口返回值是否为空！'}
-                    self.read.write_yaml_data(extarct_data)
-        except Exception as e:
-            logs.error(e)
+        self.apply_extract_rules(compile_extract_rules(testcase_extarct), response)
 
     def extract_data_list(self, testcase_extract_list, response):
         """
@@ -217,25 +239,7 @@ class RequestBase:
         Returns:
             None: 提取的数据会写入extract.yaml文件
         """
-        try:
-            for key, value in testcase_extract_list.items():
-                if "(.+?)" in value or "(.*?)" in value:
-                    ext_list = re.findall(value, response, re.S)
-                    if ext_list:
-                        extract_date = {key: ext_list}
-                        logs.info('正则提取到的参数：%s' % extract_date)
-                        self.read.write_yaml_data(extract_date)
-                if "$" in value:
-                    # 增加提取判断，有些返回结果为空提取不到，给一个默认值
-                    ext_json = jsonpath.jsonpath(json.loads(response), value)
-                    if ext_json:
-                        extract_date = {key: ext_json}
-                    else:
-                        extract_date = {key: "未提取到数据，该接口返回结果可能为空"}
-                    logs.info('json提取到参数：%s' % extract_date)
-                    self.read.write_yaml_data(extract_date)
-        except:
-            logs.error('接口返回值提取异常，请检查yaml文件extract_list表达式是否正确！')
+        self.apply_extract_rules(compile_extract_rules(testcase_extract_list, many=True), response)
 
 
 if __name__ == '__main__':
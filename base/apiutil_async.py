@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+API接口测试异步执行引擎
+功能：基于asyncio并发执行同一YAML文件中相互独立的测试用例，每个host的并发数由信号量限制
+说明：HTTP请求仍由requests发送，asyncio负责调度，阻塞的请求在线程池中执行；
+     共享会话不保存服务端下发的Cookie，并发的用例只发送各自的cookies
+用法：
+    AsyncRequestBase().run_cases(get_testcase_yaml('./testcase/ProductManager/getProductList.yaml'))
+"""
+
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import allure
+import pytest
+
+from base.apiutil import RequestBase
+from common.allureattach import attach_policy
+from common.recordlog import logs
+from conf import setting
+
+
+class AsyncTransport:
+    """
+    异步HTTP传输层
+    功能：
+    1. 在线程池中调用SendRequest.send_request发送请求，复用按host共享的连接池会话
+    2. 为每个host维护一个信号量，限制同一host的并发请求数
+    """
+
+    def __init__(self, sender, max_per_host=setting.ASYNC_MAX_PER_HOST, max_workers=setting.ASYNC_MAX_WORKERS):
+        """
+        初始化AsyncTransport类
+
+        Args:
+            sender (SendRequest): HTTP请求发送器
+            max_per_host (int): 每个host同时发送的最大请求数
+            max_workers (int): 发送请求的线程池大小
+        """
+        self.sender = sender
+        self.max_per_host = max_per_host
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='api-async')
+        self._semaphores = {}
+
+    def _semaphore(self, url):
+        """获取url对应host的信号量"""
+        host = urlsplit(url).netloc.lower()
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.max_per_host)
+        return self._semaphores[host]
+
+    async def request(self, **kwargs):
+        """
+        异步发送HTTP请求
+
+        Args:
+            **kwargs: requests.request()方法的所有参数
+
+        Returns:
+            requests.Response: HTTP响应对象
+        """
+        async with self._semaphore(kwargs['url']):
+            loop = asyncio.get_running_loop()
+            # 复制当前上下文，结构化日志的用例ID在线程池中同样可用
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(self._executor,
+                                              functools.partial(context.run, self.sender.send_request, **kwargs))
+
+    def close(self):
+        """关闭线程池"""
+        self._executor.shutdown(wait=True)
+
+
+class AsyncRequestBase(RequestBase):
+    """
+    异步接口测试基础类
+    功能：
+    1. 并发发送相互独立的测试用例请求
+    2. 含extract/extract_list的用例作为分隔点，其后的用例等待提取完成后再执行，保证接口关联数据可用
+    3. 断言、数据提取和Allure附件仍按用例顺序在主线程中逐条记录
+    """
+
+    def __init__(self, max_per_host=setting.ASYNC_MAX_PER_HOST):
+        """
+        初始化AsyncRequestBase类
+
+        Args:
+            max_per_host (int): 每个host同时发送的最大请求数
+        """
+        super().__init__()
+        self.max_per_host = max_per_host
+        # 每次run_cases创建新的传输层：线程池在运行结束后关闭，host信号量绑定当次运行的事件循环
+        self.transport = None
+
+    @staticmethod
+    def split_batches(testcase_list):
+        """
+        将用例列表切分为可并发执行的批次
+        功能：含extract/extract_list的用例会生成接口关联数据，作为当前批次的最后一条用例
+
+        Args:
+            testcase_list (list): get_testcase_yaml返回的[base_info, test_case]列表
+
+        Returns:
+            list: 批次列表
+        """
+        batches, batch = [], []
+        for base_info, test_case in testcase_list:
+            batch.append((base_info, test_case))
+            if test_case.get('extract') is not None or test_case.get('extract_list') is not None:
+                batches.append(batch)
+                batch = []
+        if batch:
+            batches.append(batch)
+        return batches
+
+    async def send_case(self, case):
+        """
+        异步发送单条用例的请求
+
+        Args:
+            case (dict): prepare_request返回的接口请求信息
+
+        Returns:
+            requests.Response或异常对象
+        """
+        self.run.record_request(case['api_name'], case['url'], case['case_name'], case['header'], case['method'],
+                                cookies=case['cookies'], attach=False, **case['request'])
+        try:
+            return await self.transport.request(method=case['method'],
+                                                url=case['url'],
+                                                headers=case['header'],
+                                                cookies=case['cookies'],
+                                                files=case['files'],
+                                                timeout=setting.API_TIMEOUT,
+                                                verify=False,
+                                                **case['request'])
+        except (Exception, pytest.fail.Exception) as e:
+            return e
+
+    async def specification_yaml_async(self, base_info, test_case):
+        """
+        异步执行单条用例，功能与specification_yaml一致
+
+        Args:
+            base_info (dict): YAML文件中的baseInfo部分
+            test_case (dict): YAML文件中的testCase部分
+
+        Returns:
+            None
+        """
+        case = self.prepare_request(base_info, test_case)
+        res = await self.send_case(case)
+        self.verify_case(case, res)
+
+    def verify_case(self, case, res):
+        """
+        在Allure步骤中记录单条用例的请求信息、响应、提取结果和断言结果
+
+        Args:
+            case (dict): prepare_request返回的接口请求信息
+            res: 接口响应对象或发送请求时的异常
+        """
+        with allure.step(case['case_name']), attach_policy.case():
+            self.attach_request(case, with_params=True)
+            if isinstance(res, BaseException):
+                raise res
+            self.handle_response(case, res)
+
+    async def run_cases_async(self, testcase_list):
+        """
+        异步执行用例列表
+
+        Args:
+            testcase_list (list): get_testcase_yaml返回的[base_info, test_case]列表
+
+        Returns:
+            list: 执行失败的用例名称及异常信息
+        """
+        failures = []
+        self.transport = AsyncTransport(self.run, max_per_host=self.max_per_host)
+        try:
+            for batch in self.split_batches(testcase_list):
+                cases = [self.prepare_request(base_info, test_case) for base_info, test_case in batch]
+                results = await asyncio.gather(*[self.send_case(case) for case in cases])
+                for case, res in zip(cases, results):
+                    try:
+                        self.verify_case(case, res)
+                    except (Exception, pytest.fail.Exception) as e:
+                        logs.error('用例【%s】执行失败：%s', case['case_name'], e)
+                        failures.append((case['case_name'], e))
+        finally:
+            self.transport.close()
+            self.transport = None
+        return failures
+
+    def run_cases(self, testcase_list):
+        """
+        并发执行YAML文件中的测试用例，所有用例执行完成后统一汇总失败信息
+
+        Args:
+            testcase_list (list): get_testcase_yaml返回的[base_info, test_case]列表
+
+        Returns:
+            None
+        """
+        failures = asyncio.run(self.run_cases_async(testcase_list))
+        if failures:
+            pytest.fail('以下用例执行失败：\n' + '\n'.join('%s：%s' % (name, e) for name, e in failures))
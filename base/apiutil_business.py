@@ -9,12 +9,12 @@ from common.sendrequest import SendRequest
 from common.readyaml import ReadYamlData
 from common.recordlog import logs
 from conf.operationConfig import OperationConfig
+from common.allureattach import attach_policy, LABEL, BODY
 from common.assertions import Assertions
-from common.debugtalk import DebugTalk
-import allure
+from common.debugtalk import function_registry
+from common.template import render, stringify_values
+from base.caseplan import plan_cache, compile_extract_rules, match_jsonpath_rules
 import json
-import jsonpath
-import re
 import traceback
 from json.decoder import JSONDecodeError
 
@@ -53,7 +53,7 @@ class RequestBase(object):
         """
         try:
             for key, value in data_dict.items():
-                if isinstance(value, list):
+                if isinstance(value, list) and all(isinstance(v, str) for v in value):
                     value_lst = ','.join(value).split(',')
                     data_dict[key] = value_lst
                 return data_dict
@@ -63,7 +63,8 @@ class RequestBase(object):
     def replace_load(self, data):
         """
         YAML数据动态替换解析
-        功能：将YAML文件中的${函数名(参数)}格式的字符串替换为实际值
+        功能：将YAML文件中的${函数名(参数)}格式的字符串替换为实际值，
+             数据只编译一次模板并按节点缓存，整个字符串为占位符时保留返回值的原始类型
         
         Args:
             data: 需要替换的数据，可以是字符串、字典或列表
@@ -71,37 +72,31 @@ class RequestBase(object):
         Returns:
             替换后的数据
         """
-        str_data = data
-        if not isinstance(data, str):
-            str_data = json.dumps(data, ensure_ascii=False)
-        for i in range(str_data.count('${')):
-            if '${' in str_data and '}' in str_data:
-                # index检测字符串是否子字符串，并找到字符串的索引位置
-                start_index = str_data.index('$')
-                end_index = str_data.index('}', start_index)
-                # yaml文件的参数，如：${get_yaml_data(loginname)}
-                ref_all_params = str_data[start_index:end_index + 1]
-                # 函数名，获取Debugtalk的方法
-                func_name = ref_all_params[2:ref_all_params.index("(")]
-                # 函数里的参数
-                func_params = ref_all_params[ref_all_params.index("(") + 1:ref_all_params.index(")")]
-                # 传入替换的参数获取对应的值,*func_params按,分割重新得到一个字符串
-                extract_data = getattr(DebugTalk(), func_name)(*func_params.split(',') if func_params else "")
-                if extract_data and isinstance(extract_data, list):
-                    extract_data = ','.join(e for e in extract_data)
-                str_data = str_data.replace(ref_all_params, str(extract_data))
-        # 还原数据
+        data = render(data, function_registry.resolve)
+        if data and isinstance(data, dict):
+            self.handler_yaml_list(data)
+        return data
+
+    def render_node(self, node):
+        """
+        渲染执行计划中编译好的模板，结果为字典时与replace_load一样处理列表参数
+
+        Args:
+            node: 执行计划中的模板节点
+
+        Returns:
+            渲染后的数据
+        """
+        data = node.render(function_registry.resolve)
         if data and isinstance(data, dict):
-            data = json.loads(str_data)
             self.handler_yaml_list(data)
-        else:
-            data = str_data
         return data
 
     def specification_yaml(self, case_info):
         """
         规范YAML测试用例的处理方法
-        功能：解析YAML测试用例，发送HTTP请求，处理响应数据，执行断言
+        功能：解析YAML测试用例，发送HTTP请求，处理响应数据，执行断言；
+             每条testCase编译为执行计划并缓存，不修改YAML用例数据，同一个场景可以重复执行
         
         Args:
             case_info (dict): YAML测试用例信息，包含baseInfo和testCase
@@ -109,77 +104,67 @@ class RequestBase(object):
         Returns:
             None
         """
-        params_type = ['params', 'data', 'json']
-        cookie = None
+        base_info = case_info["baseInfo"]
         try:
-            base_url = self.conf.get_section_for_data('api_envi', 'host')
-            # base_url = self.replace_load(case_info['baseInfo']['url'])
-            url = base_url + case_info["baseInfo"]["url"]
-            allure.attach(url, f'接口地址：{url}')
-            api_name = case_info["baseInfo"]["api_name"]
-            allure.attach(api_name, f'接口名：{api_name}')
-            method = case_info["baseInfo"]["method"]
-            allure.attach(method, f'请求方法：{method}')
-            header = self.replace_load(case_info["baseInfo"]["header"])
-            allure.attach(str(header), '请求头信息', allure.attachment_type.TEXT)
-            try:
-                cookie = self.replace_load(case_info["baseInfo"]["cookies"])
-                allure.attach(str(cookie), 'Cookie', allure.attachment_type.TEXT)
-            except:
-                pass
-            for tc in case_info["testCase"]:
-                case_name = tc.pop("case_name")
-                allure.attach(case_name, f'测试用例名称：{case_name}', allure.attachment_type.TEXT)
-                # 断言结果解析替换
-                val = self.replace_load(tc.get('validation'))
-                tc['validation'] = val
-                # 字符串形式的列表转换为list类型
-                validation = eval(tc.pop('validation'))
-                allure_validation = str([str(list(i.values())) for i in validation])
-                allure.attach(allure_validation, "预期结果", allure.attachment_type.TEXT)
-                extract = tc.pop('extract', None)
-                extract_lst = tc.pop('extract_list', None)
-                for key, value in tc.items():
-                    if key in params_type:
-                        tc[key] = self.replace_load(value)
-                file, files = tc.pop("files", None), None
-                if file is not None:
-                    for fk, fv in file.items():
-                        allure.attach(json.dumps(file), '导入文件')
-                        files = {fk: open(fv, 'rb')}
-                res = self.run.run_main(name=api_name,
-                                        url=url,
-                                        case_name=case_name,
-                                        header=header,
-                                        cookies=cookie,
-                                        method=method,
-                                        file=files, **tc)
-                res_text = res.text
-                allure.attach(res_text, '接口响应信息', allure.attachment_type.TEXT)
-                status_code = res.status_code
-                allure.attach(self.allure_attach_response(res.json()), '接口响应信息', allure.attachment_type.TEXT)
+            with attach_policy.case():
+                host = self.conf.get_section_for_data('api_envi', 'host')
+                attach_policy.attach(host + base_info["url"], f'接口地址：{host + base_info["url"]}', kind=LABEL)
+                attach_policy.attach(base_info["api_name"], f'接口名：{base_info["api_name"]}', kind=LABEL)
+                attach_policy.attach(base_info["method"], f'请求方法：{base_info["method"]}', kind=LABEL)
+                for tc in case_info["testCase"]:
+                    plan = plan_cache.get(base_info, tc, host)
+                    header = stringify_values(self.render_node(plan.header))
+                    attach_policy.attach(str(header), '请求头信息')
+                    cookie = None
+                    if plan.cookies is not None:
+                        cookie = self.render_node(plan.cookies)
+                        attach_policy.attach(str(cookie), 'Cookie')
+                    attach_policy.attach(plan.case_name, f'测试用例名称：{plan.case_name}', kind=LABEL)
+                    # 断言结果解析替换
+                    validation = self.render_node(plan.validation)
+                    allure_validation = str([str(list(i.values())) for i in validation])
+                    attach_policy.attach(allure_validation, "预期结果")
+                    request = dict(plan.static_params)
+                    for key, node in plan.params:
+                        request[key] = self.render_node(node)
+                    files = None
+                    if plan.file is not None:
+                        for fk, fv in plan.file.items():
+                            attach_policy.attach(json.dumps(plan.file), '导入文件')
+                            files = {fk: open(fv, 'rb')}
+                    res = self.run.run_main(name=plan.api_name,
+                                            url=plan.url,
+                                            case_name=plan.case_name,
+                                            header=header,
+                                            cookies=cookie,
+                                            method=plan.method,
+                                            file=files, **request)
+                    res_text = res.text
+                    status_code = res.status_code
 
-                try:
-                    res_json = json.loads(res_text)
-                    if extract is not None:
-                        self.extract_data(extract, res_text)
-                    if extract_lst is not None:
-                        self.extract_data_list(extract_lst, res_text)
-                    # 处理断言
-                    assert_res.assert_result(validation, res_json, status_code)
-                except JSONDecodeError as js:
-                    logs.error("系统异常或接口未请求！")
-                    raise js
-                except Exception as e:
-                    logs.error(str(traceback.format_exc()))
-                    raise e
+                    try:
+                        # 响应体只解析一次，报告、提取和断言共用
+                        res_json = res.json_data
+                        if attach_policy.enabled:
+                            attach_policy.attach(self.allure_attach_response(res_json), '接口响应信息', kind=BODY)
+                        self.apply_extract_rules(plan.extract + plan.extract_list, res_text, res_json)
+                        # 处理断言
+                        assert_res.assert_result(validation, res_json, status_code)
+                    except JSONDecodeError as js:
+                        logs.error("系统异常或接口未请求！")
+                        # 响应体不是JSON时附上原始响应文本
+                        attach_policy.attach(res_text, '接口响应信息', kind=BODY)
+                        raise js
+                    except Exception as e:
+                        logs.error(str(traceback.format_exc()))
+                        raise e
         except Exception as e:
             logs.error(e)
             raise e
 
     @classmethod
     def allure_attach_response(cls, response):
-        if isinstance(response, dict):
+        if isinstance(response, (dict, list)):
             allure_response = json.dumps(response, ensure_ascii=False, indent=4)
         else:
             allure_response = response
@@ -192,28 +177,7 @@ class RequestBase(object):
         :param response: 接口的实际返回值,str类型
         :return:
         """
-        pattern_lst = ['(.+?)', '(.*?)', r'(\d+)', r'(\d*)']
-        try:
-            for key, value in testcase_extract.items():
-                for pat in pattern_lst:
-                    if pat in value:
-                        ext_list = re.search(value, response)
-                        if pat in [r'(\d+)', r'(\d*)']:
-                            extract_date = {key: int(ext_list.group(1))}
-                        else:
-                            extract_date = {key: ext_list.group(1)}
-                        logs.info('正则提取到的参数：%s' % extract_date)
-                        self.read.write_yaml_data(extract_date)
-                if "$" in value:
-                    ext_json = jsonpath.jsonpath(json.loads(response), value)[0]
-                    if ext_json:
-                        extract_date = {key: ext_json}
-                    else:
-                        extract_date = {key: "未提取到数据，该接口返回结果可能为空"}
-                    logs.info('json提取到参数：%s' % extract_date)
-                    self.read.write_yaml_data(extract_date)
-        except:
-            logs.error('接口返回值提取异常，请检查yaml文件extract表达式是否正确！')
+        self.apply_extract_rules(compile_extract_rules(testcase_extract), response)
 
     def extract_data_list(self, testcase_extract_list, response):
         """
@@ -222,22 +186,33 @@ class RequestBase(object):
         :param response: 接口的实际返回值,str类型
         :return:
         """
+        self.apply_extract_rules(compile_extract_rules(testcase_extract_list, many=True), response)
+
+    def apply_extract_rules(self, rules, response, response_json=None):
+        """
+        按编译好的提取规则提取接口返回值并写入extract.yaml
+        :param rules: ExtractRule元组
+        :param response: 接口的实际返回值,str类型
+        :param response_json: 已解析的响应数据，为None时按需解析
+        :return:
+        """
         try:
-            for key, value in testcase_extract_list.items():
-                if "(.+?)" in value or "(.*?)" in value:
-                    ext_list = re.findall(value, response, re.S)
-                    if ext_list:
-                        extract_date = {key: ext_list}
-                        logs.info('正则提取到的参数：%s' % extract_date)
-                        self.read.write_yaml_data(extract_date)
-                if "$" in value:
-                    # 增加提取判断，有些返回结果为空提取不到，给一个默认值
-                    ext_json = jsonpath.jsonpath(json.loads(response), value)
-                    if ext_json:
-                        extract_date = {key: ext_json}
-                    else:
-                        extract_date = {key: "未提取到数据，该接口返回结果可能为空"}
-                    logs.info('json提取到参数：%s' % extract_date)
-                    self.read.write_yaml_data(extract_date)
-        except:
-            logs.error('接口返回值提取异常，请检查yaml文件extract_list表达式是否正确！')
+            matches = match_jsonpath_rules(rules, response, response_json)
+        except Exception:
+            # 响应不是JSON时，JSONPath规则逐条提取并记录异常
+            matches = {}
+        for rule in rules:
+            try:
+                if rule in matches:
+                    value = rule.pick(matches[rule])
+                else:
+                    value = rule.extract(response, response_json)
+                if value is None:
+                    if rule.kind == 'regex':
+                        continue
+                    value = "未提取到数据，该接口返回结果可能为空"
+                extract_date = {rule.key: value}
+                logs.info('%s提取到参数：%s', '正则' if rule.kind == 'regex' else 'json', extract_date)
+                self.read.write_yaml_data(extract_date)
+            except Exception:
+                logs.error('接口返回值提取异常，请检查yaml文件extract表达式【%s】是否正确！', rule.key)
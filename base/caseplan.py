@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+用例执行计划
+功能：将YAML用例编译为不可变的执行计划，包含接口地址、请求头/Cookie/请求参数/断言的模板以及编译好的提取规则，
+     每次执行只需渲染动态数据并发送请求，不再使用eval，也不修改YAML用例数据
+"""
+
+import ast
+import re
+import threading
+from collections import OrderedDict, namedtuple
+
+from common.apiresponse import json_loads
+from common.fastjsonpath import compile_path, find_many
+from common.template import compile_template
+
+# 请求参数类型
+PARAMS_TYPE = ('data', 'json', 'params')
+# 编译执行计划时不属于请求参数的用例字段
+CASE_KEYS = ('case_name', 'validation', 'extract', 'extract_list', 'files')
+# 提取单个参数时识别为正则表达式的分组
+EXTRACT_PATTERNS = ('(.*?)', '(.+?)', r'(\d+)', r'(\d*)', r'(\d)')
+# 提取结果需要转为int的正则分组
+INT_PATTERNS = (r'(\d+)', r'(\d*)', r'(\d)')
+# 提取多个参数时识别为正则表达式的分组
+EXTRACT_LIST_PATTERNS = ('(.+?)', '(.*?)')
+# 执行计划缓存最大数量
+PLAN_CACHE_SIZE = 4096
+
+
+class ExtractRule(namedtuple('ExtractRule', ['key', 'kind', 'expr', 'as_int', 'many'])):
+    """
+    编译好的提取规则
+    kind为regex时expr是编译好的正则表达式，为jsonpath时expr是编译好的JSONPath表达式
+    """
+
+    def pick(self, values):
+        """从JSONPath匹配结果中取出提取值，未匹配时返回None"""
+        if not values:
+            return None
+        return values if self.many else values[0]
+
+    def extract(self, response_text, response_json=None):
+        """
+        从响应中提取数据
+
+        Args:
+            response_text (str): 接口响应文本
+            response_json: 已解析的响应数据，为None时按需解析response_text
+
+        Returns:
+            提取到的数据，未提取到时返回None
+        """
+        if self.kind == 'regex':
+            if self.many:
+                return self.expr.findall(response_text) or None
+            match = self.expr.search(response_text)
+            if match is None:
+                return None
+            return int(match.group(1)) if self.as_int else match.group(1)
+        if response_json is None:
+            response_json = json_loads(response_text)
+        return self.pick(self.expr.find(response_json))
+
+
+def compile_extract_rules(rules, many=False):
+    """
+    编译YAML中的extract/extract_list提取规则
+
+    Args:
+        rules (dict): 提取规则，key为变量名，value为正则表达式或JSON路径
+        many (bool): True表示extract_list，提取所有匹配结果
+
+    Returns:
+        tuple: ExtractRule元组
+    """
+    compiled = []
+    for key, value in (rules or {}).items():
+        patterns = EXTRACT_LIST_PATTERNS if many else EXTRACT_PATTERNS
+        if any(pat in value for pat in patterns):
+            as_int = not many and any(pat in value for pat in INT_PATTERNS)
+            compiled.append(ExtractRule(key, 'regex', re.compile(value, re.S if many else 0), as_int, many))
+        elif '$' in value:
+            compiled.append(ExtractRule(key, 'jsonpath', compile_path(value), False, many))
+    return tuple(compiled)
+
+
+def match_jsonpath_rules(rules, response_text, response_json=None):
+    """
+    在响应数据的一次遍历中求值所有JSONPath提取规则
+
+    Args:
+        rules (tuple): ExtractRule元组
+        response_text (str): 接口响应文本
+        response_json: 已解析的响应数据，为None时按需解析response_text
+
+    Returns:
+        dict: key为JSONPath提取规则，value为匹配结果，未匹配时为False
+    """
+    json_rules = [rule for rule in rules if rule.kind == 'jsonpath']
+    if not json_rules:
+        return {}
+    if response_json is None:
+        response_json = json_loads(response_text)
+    return dict(zip(json_rules, find_many(response_json, [rule.expr for rule in json_rules])))
+
+
+CasePlan = namedtuple('CasePlan', ['api_name', 'url', 'method', 'case_name', 'header', 'cookies', 'validation',
+                                   'extract', 'extract_list', 'params', 'static_params', 'file'])
+CasePlan.__doc__ = """
+用例执行计划
+header、cookies、validation和params中的值为编译好的模板，static_params为不含占位符的其他请求参数
+"""
+
+
+def compile_case(base_info, test_case, host):
+    """
+    将YAML用例编译为执行计划
+
+    Args:
+        base_info (dict): YAML文件中的baseInfo部分
+        test_case (dict): YAML文件中的testCase部分
+        host (str): 接口域名
+
+    Returns:
+        CasePlan: 执行计划
+    """
+    cookies = base_info.get('cookies')
+    params = tuple((key, compile_template(value)) for key, value in test_case.items() if key in PARAMS_TYPE)
+    static_params = tuple((key, value) for key, value in test_case.items()
+                          if key not in PARAMS_TYPE and key not in CASE_KEYS)
+    return CasePlan(api_name=base_info['api_name'],
+                    url=host + base_info['url'],
+                    method=base_info['method'],
+                    case_name=test_case['case_name'],
+                    header=compile_template(base_info['header']),
+                    cookies=None if cookies is None else compile_template(cookies),
+                    validation=compile_template(test_case.get('validation')),
+                    extract=compile_extract_rules(test_case.get('extract')),
+                    extract_list=compile_extract_rules(test_case.get('extract_list'), many=True),
+                    params=params,
+                    static_params=static_params,
+                    file=test_case.get('files'))
+
+
+def parse_cookies(cookies):
+    """字符串形式的Cookie按Python字面量解析，不执行任意代码"""
+    if isinstance(cookies, str):
+        return ast.literal_eval(cookies)
+    return cookies
+
+
+class PlanCache:
+    """
+    执行计划缓存
+    功能：按YAML节点对象和接口域名缓存执行计划（缓存中保留节点引用，节点的id不会被复用），
+         同一条用例重复执行时直接复用执行计划
+    """
+
+    def __init__(self, maxsize=PLAN_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, base_info, test_case, host):
+        """
+        获取用例的执行计划，未命中时编译并缓存
+
+        Args:
+            base_info (dict): YAML文件中的baseInfo部分
+            test_case (dict): YAML文件中的testCase部分
+            host (str): 接口域名
+
+        Returns:
+            CasePlan: 执行计划
+        """
+        key = (id(base_info), id(test_case), host)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[0] is base_info and entry[1] is test_case:
+                self._cache.move_to_end(key)
+                return entry[2]
+        plan = compile_case(base_info, test_case, host)
+        with self._lock:
+            self._cache[key] = (base_info, test_case, plan)
+            if len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+        return plan
+
+    def discard(self, node_ids):
+        """
+        删除引用了指定YAML节点的执行计划，YAML文件执行完后释放节点
+
+        Args:
+            node_ids (set): YAML节点的id
+        """
+        with self._lock:
+            for key in [key for key in self._cache if key[0] in node_ids or key[1] in node_ids]:
+                del self._cache[key]
+
+
+plan_cache = PlanCache()
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+Allure报告附件策略
+功能：按ALLURE_ATTACH_MODE决定附件的写入方式
+1. full：每项信息单独写一个附件（默认，与原有报告一致）
+2. lean：一条用例的接口信息、请求参数、响应和断言结果暂存在contextvar中，用例结束时合并为一个附件写入，
+        成功用例的报文超过ALLURE_ATTACH_MAX_BYTES时截断，失败用例保留完整报文
+3. off：不写附件，大批量性能测试时避免report/temp下产生大量小文件
+附件文件按内容哈希命名（ALLURE_ATTACH_DEDUP），内容相同的附件只写一次，所有用例结果引用同一个文件
+"""
+
+import contextvars
+import gzip
+import hashlib
+import threading
+from contextlib import contextmanager
+
+import allure
+from allure_commons import plugin_manager
+from allure_commons.reporter import AllureReporter
+
+from conf import setting
+
+# 附件内容类型：LABEL只展示附件名称（名称中已包含信息），TEXT完整展示，BODY为请求/响应报文，成功时可截断
+LABEL = 'label'
+TEXT = 'text'
+BODY = 'body'
+
+_case_sections = contextvars.ContextVar('allure_case_sections', default=None)
+
+
+class AttachmentStore:
+    """
+    按内容寻址的附件存储
+    功能：
+    1. 附件的uuid为内容的sha1，附件文件名由uuid生成，相同内容的附件（如列表页、错误响应）引用同一个文件
+    2. 内容首次出现时通过AllureReporter.attach_data写入，触发report_attached_data钩子，所有allure监听器都能收到内容；
+       再次出现时只在当前用例结果中添加对该文件的引用，不再写文件
+    3. 超过gzip_bytes的附件压缩后保存，只有首次写入时才压缩
+    4. 依赖allure_python_commons 2.x的AllureReporter接口（版本见requirements.txt），
+       未找到报告对象、接口不兼容或当前没有正在执行的用例时退回allure.attach
+    """
+
+    def __init__(self, enabled=None, gzip_bytes=None):
+        self.enabled = setting.ALLURE_ATTACH_DEDUP if enabled is None else enabled
+        self.gzip_bytes = setting.ALLURE_ATTACH_GZIP_BYTES if gzip_bytes is None else gzip_bytes
+        self._written = set()
+        self._lock = threading.Lock()
+        self.writes = 0
+        self.reuses = 0
+        self.saved_bytes = 0
+
+    @staticmethod
+    def _reporter():
+        """
+        从allure插件中查找allure-pytest监听器使用的报告对象
+
+        Returns:
+            AllureReporter: 未启用allure报告或版本不兼容时为None
+        """
+        for plugin in plugin_manager.get_plugins():
+            reporter = getattr(plugin, 'allure_logger', None)
+            if isinstance(reporter, AllureReporter) and hasattr(reporter, '_attach'):
+                return reporter
+        return None
+
+    def attach(self, body, name, attachment_type=allure.attachment_type.TEXT):
+        """
+        写入一个附件，内容相同时复用已写入的文件
+
+        Args:
+            body (str|bytes): 附件内容
+            name (str): 附件名称
+            attachment_type: Allure附件类型
+        """
+        reporter = self._reporter() if self.enabled else None
+        if reporter is None:
+            allure.attach(body, name, attachment_type)
+            return
+        data = body if isinstance(body, bytes) else str(body).encode('utf-8')
+        if isinstance(attachment_type, allure.attachment_type):
+            mime_type, extension = attachment_type.mime_type, attachment_type.extension
+        else:
+            mime_type, extension = attachment_type, 'attach'
+        compress = 0 < self.gzip_bytes <= len(data)
+        if compress:
+            mime_type, extension = 'application/gzip', extension + '.gz'
+        digest = hashlib.sha1(data).hexdigest()
+        key = (digest, extension)
+        with self._lock:
+            reuse = key in self._written
+            self._written.add(key)
+        try:
+            if reuse:
+                reporter._attach(digest, name=name, attachment_type=mime_type, extension=extension)
+            else:
+                reporter.attach_data(digest, gzip.compress(data, mtime=0) if compress else data, name=name,
+                                     attachment_type=mime_type, extension=extension)
+        except KeyError:
+            # 当前没有正在执行的用例、fixture或步骤
+            with self._lock:
+                if not reuse:
+                    self._written.discard(key)
+            allure.attach(body, name, attachment_type)
+            return
+        with self._lock:
+            if reuse:
+                self.reuses += 1
+                self.saved_bytes += len(data)
+            else:
+                self.writes += 1
+
+    def stats(self):
+        """附件写入统计：写入文件数、复用次数、少写的字节数"""
+        return {'writes': self.writes, 'reuses': self.reuses, 'saved_bytes': self.saved_bytes}
+
+
+class AttachPolicy:
+    """Allure附件策略"""
+    MODES = ('full', 'lean', 'off')
+
+    def __init__(self, mode=None, max_bytes=None):
+        self.mode = mode or setting.ALLURE_ATTACH_MODE
+        if self.mode not in self.MODES:
+            raise ValueError('ALLURE_ATTACH_MODE只支持%s，当前为：%s' % ('/'.join(self.MODES), self.mode))
+        self.max_bytes = setting.ALLURE_ATTACH_MAX_BYTES if max_bytes is None else max_bytes
+        self.store = AttachmentStore()
+
+    @property
+    def enabled(self):
+        """是否写入附件，格式化报文等耗时操作前先判断"""
+        return self.mode != 'off'
+
+    def truncate(self, body):
+        """
+        按字节数截断报文
+
+        Args:
+            body (str): 报文
+
+        Returns:
+            str: 未超过max_bytes时原样返回，否则返回截断后的报文并注明原始大小
+        """
+        if len(body) * 4 <= self.max_bytes:
+            # UTF-8每个字符最多4字节，不需要编码即可确定未超限
+            return body
+        data = body.encode('utf-8')
+        if len(data) <= self.max_bytes:
+            return body
+        return '%s\n...（已截断，共%s字节）' % (data[:self.max_bytes].decode('utf-8', errors='ignore'), len(data))
+
+    def attach(self, body, name, attachment_type=allure.attachment_type.TEXT, kind=TEXT):
+        """
+        写入一个附件，lean模式下在用例内时暂存，用例结束时合并写入
+
+        Args:
+            body: 附件内容
+            name (str): 附件名称
+            attachment_type: Allure附件类型
+            kind (str): 内容类型，LABEL/TEXT/BODY
+        """
+        if self.mode == 'off':
+            return
+        sections = _case_sections.get()
+        if self.mode == 'full':
+            self.store.attach(body, name, attachment_type)
+        elif sections is None:
+            # 不在用例内（如fixture中），无法得知用例结果，报文按成功用例截断后直接写入
+            self.store.attach(self.truncate(str(body)) if kind == BODY else body, name, attachment_type)
+        else:
+            sections.append((name, body, kind))
+
+    def render(self, sections, failed):
+        """
+        将暂存的附件合并为一段文本
+
+        Args:
+            sections (list): (附件名称, 内容, 内容类型)列表
+            failed (bool): 用例是否失败，失败时报文不截断
+
+        Returns:
+            str: 合并后的附件内容
+        """
+        parts = []
+        for name, body, kind in sections:
+            if kind == LABEL:
+                parts.append(name)
+                continue
+            if isinstance(body, bytes):
+                body = body.decode('utf-8', errors='replace')
+            elif not isinstance(body, str):
+                body = str(body)
+            if kind == BODY and not failed:
+                body = self.truncate(body)
+            parts.append('%s\n%s' % (name, body))
+        return '\n\n'.join(parts)
+
+    @contextmanager
+    def case(self, title='接口请求信息'):
+        """
+        用例附件范围，lean模式下范围内的附件在退出时合并为一个附件，范围内抛出异常视为用例失败
+
+        Args:
+            title (str): 合并后的附件名称，用例失败时追加“（失败）”
+        """
+        if self.mode != 'lean' or _case_sections.get() is not None:
+            yield
+            return
+        sections = []
+        token = _case_sections.set(sections)
+        failed = True
+        try:
+            yield
+            failed = False
+        finally:
+            _case_sections.reset(token)
+            if sections:
+                self.store.attach(self.render(sections, failed), title + ('（失败）' if failed else ''),
+                                  allure.attachment_type.TEXT)
+
+
+attach_policy = AttachPolicy()
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+接口响应包装类
+功能：响应体只在第一次使用时解析一次，解析结果由Allure报告、数据提取和断言共享，并记录解析耗时
+"""
+
+import json
+import time
+
+from conf import setting
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_UNSET = object()
+# 先按UTF-8字节直接解析的编码：ISO-8859-1是requests对未声明charset的text/*响应的默认值，实际内容不是UTF-8时再按res.text解析
+_UTF8_ENCODINGS = ('utf-8', 'utf8', 'ascii', 'iso-8859-1')
+
+
+def json_loads(content):
+    """
+    按配置的JSON解析库解析数据
+
+    Args:
+        content (bytes|str): JSON数据
+
+    Returns:
+        解析后的数据
+    """
+    if orjson is not None and setting.JSON_BACKEND in ('auto', 'orjson'):
+        try:
+            return orjson.loads(content)
+        except orjson.JSONDecodeError:
+            # orjson不支持BOM等情况，交给标准库再解析一次，解析失败时抛出标准库的异常
+            pass
+    return json.loads(content)
+
+
+class ApiResponse:
+    """
+    接口响应包装类
+    功能：
+    1. 代理requests.Response的所有属性，原有的res.text、res.status_code等用法不变
+    2. json_data/json()懒解析并缓存响应体，多处使用只解析一次
+    3. decode_ms记录解析耗时，单位：毫秒
+    """
+
+    def __init__(self, response):
+        """
+        初始化ApiResponse类
+
+        Args:
+            response (requests.Response): 原始响应对象
+        """
+        self.response = response
+        self.decode_ms = None
+        self._json = _UNSET
+
+    def __getattr__(self, item):
+        return getattr(self.response, item)
+
+    def __bool__(self):
+        return bool(self.response)
+
+    def __repr__(self):
+        return repr(self.response)
+
+    @property
+    def json_data(self):
+        """
+        解析后的响应体，非JSON响应抛出json.JSONDecodeError
+
+        Returns:
+            dict|list: 解析后的响应数据
+        """
+        if self._json is _UNSET:
+            start = time.perf_counter()
+            try:
+                encoding = (self.response.encoding or '').lower().replace('_', '-')
+                if encoding and encoding not in _UTF8_ENCODINGS:
+                    # 响应头声明了GBK等非UTF-8编码，按res.text解码后再解析
+                    self._json = json.loads(self.response.text)
+                else:
+                    try:
+                        self._json = json_loads(self.response.content)
+                    except UnicodeDecodeError:
+                        # 未声明编码且不是UTF-8，交给requests推断编码
+                        self._json = json.loads(self.response.text)
+            finally:
+                self.decode_ms = round((time.perf_counter() - start) * 1000, 3)
+        return self._json
+
+    def json(self, **kwargs):
+        """兼容requests.Response.json()"""
+        return self.json_data
@@ -5,12 +5,14 @@
 """
 
 import traceback
-import allure
-import jsonpath
 import operator
+import time
 
-from common.recordlog import logs
-from common.connection import ConnectMysql
+from common.allureattach import attach_policy, TEXT
+from common.recordlog import logs, event_log
+from common.connection import ConnectMysql, ConnectClickHouse
+from common.fastjsonpath import KeyIndex, jsonpath
+from common.reconcile import reconcile_frames, to_frame
 
 
 class Assertions:
@@ -23,9 +25,10 @@ class Assertions:
     4. 响应结果任意值断言
     5. 数据库断言
     6. 响应时间断言
+    7. 接口数据与数据库数据对账断言
     """
 
-    def contains_assert(self, value, response, status_code):
+    def contains_assert(self, value, response, status_code, index=None):
         """
         字符串包含断言模式
         功能：断言预期结果的字符串是否包含在接口的响应信息中
@@ -34,112 +37,163 @@ class Assertions:
             value (dict): 预期结果，YAML文件的预期结果值
             response (dict): 接口实际响应结果
             status_code (int): 响应状态码
+            index (KeyIndex, optional): 响应数据的key索引，为None时新建
             
         Returns:
             int: 断言结果状态标识，0表示成功，非0表示失败
         """
         # 断言状态标识，0成功，其他失败
         flag = 0
+        index = index or KeyIndex(response)
         for assert_key, assert_value in value.items():
             if assert_key == "status_code":
                 if assert_value != status_code:
                     flag += 1
-                    allure.attach(f"预期结果：{assert_value}\n实际结果：{status_code}", '响应代码断言结果:失败',
-                                  attachment_type=allure.attachment_type.TEXT)
-                    logs.error("contains断言失败：接口返回码【%s】不等于【%s】" % (status_code, assert_value))
+                    attach_policy.attach(f"预期结果：{assert_value}\n实际结果：{status_code}", '响应代码断言结果:失败',
+                                         kind=TEXT)
+                    logs.error("contains断言失败：接口返回码【%s】不等于【%s】", status_code, assert_value)
             else:
-                resp_list = jsonpath.jsonpath(response, "$..%s" % assert_key)
+                resp_list = index.find(assert_key)
+                if not resp_list:
+                    flag += 1
+                    attach_policy.attach(f"预期结果：{assert_value}\n实际结果：响应中不存在字段【{assert_key}】",
+                                         '响应文本断言结果：失败', kind=TEXT)
+                    logs.error("响应文本断言失败：响应中不存在字段【%s】", assert_key)
+                    continue
                 if isinstance(resp_list[0], str):
                     resp_list = ''.join(resp_list)
-                if resp_list:
-                    assert_value = None if assert_value.upper() == 'NONE' else assert_value
-                    if assert_value in resp_list:
-                        logs.info("字符串包含断言成功：预期结果【%s】,实际结果【%s】" % (assert_value, resp_list))
-                    else:
-                        flag = flag + 1
-                        allure.attach(f"预期结果：{assert_value}\n实际结果：{resp_list}", '响应文本断言结果：失败',
-                                      attachment_type=allure.attachment_type.TEXT)
-                        logs.error("响应文本断言失败：预期结果为【%s】,实际结果为【%s】" % (assert_value, resp_list))
+                # 整个值为占位符时渲染结果保留原始类型（如提取的int），按文本比较
+                assert_value = None if str(assert_value).upper() == 'NONE' else str(assert_value)
+                if assert_value is None:
+                    contained = not isinstance(resp_list, str) and None in resp_list
+                elif isinstance(resp_list, str):
+                    contained = assert_value in resp_list
+                else:
+                    contained = any(assert_value in str(item) for item in resp_list)
+                if contained:
+                    logs.info("字符串包含断言成功：预期结果【%s】,实际结果【%s】", assert_value, resp_list)
+                else:
+                    flag = flag + 1
+                    attach_policy.attach(f"预期结果：{assert_value}\n实际结果：{resp_list}", '响应文本断言结果：失败',
+                                         kind=TEXT)
+                    logs.error("响应文本断言失败：预期结果为【%s】,实际结果为【%s】", assert_value, resp_list)
         return flag
 
-    def equal_assert(self, expected_results, actual_results, statuc_code=None):
+    @staticmethod
+    def pick_actual_results(expected_results, index):
+        """
+        按预期结果的key从响应数据中取出实际结果，实际结果中不存在的key不放入结果字典
+
+        Args:
+            expected_results (dict): 预期结果
+            index (KeyIndex): 响应数据的key索引
+
+        Returns:
+            tuple: (实际结果字典, 响应数据中不存在的key列表)
+        """
+        missing = object()
+        actual = {key: index.get(key, missing) for key in expected_results}
+        return ({key: value for key, value in actual.items() if value is not missing},
+                [key for key, value in actual.items() if value is missing])
+
+    @staticmethod
+    def missing_keys_failed(mode, expected_results, missing_keys):
+        """
+        预期结果的key在响应数据中不存在时记录断言失败
+
+        Args:
+            mode (str): 断言模式名称，如相等、不相等
+            expected_results (dict): 预期结果
+            missing_keys (list): 响应数据中不存在的key
+        """
+        logs.error("%s断言失败：响应中不存在字段%s，预期结果：%s", mode, missing_keys, expected_results)
+        attach_policy.attach(f"预期结果：{expected_results}\n实际结果：响应中不存在字段{missing_keys}",
+                             f'{mode}断言结果：失败', kind=TEXT)
+
+    def equal_assert(self, expected_results, actual_results, statuc_code=None, index=None):
         """
         相等断言模式
-        功能：断言预期结果与实际结果是否相等
+        功能：断言预期结果与实际结果是否相等，预期结果的key可以是响应数据中任意层级的字段
         
         Args:
             expected_results (dict): 预期结果，YAML文件validation值
             actual_results (dict): 接口实际响应结果
             statuc_code (int, optional): 响应状态码
+            index (KeyIndex, optional): 响应数据的key索引，为None时新建
             
         Returns:
             int: 断言结果状态标识，0表示成功，非0表示失败
         """
         flag = 0
         if isinstance(actual_results, dict) and isinstance(expected_results, dict):
-            # 找出实际结果与预期结果共同的key
-            common_keys = list(expected_results.keys() & actual_results.keys())[0]
-            # 根据相同的key去实际结果中获取，并重新生成一个实际结果的字典
-            new_actual_results = {common_keys: actual_results[common_keys]}
+            index = index or KeyIndex(actual_results)
+            # 按预期结果的key取实际结果（最外层不存在时取任意层级的第一个值），重新生成一个实际结果的字典
+            new_actual_results, missing_keys = self.pick_actual_results(expected_results, index)
             eq_assert = operator.eq(new_actual_results, expected_results)
-            if eq_assert:
-                logs.info(f"相等断言成功：接口实际结果：{new_actual_results}，等于预期结果：" + str(expected_results))
-                allure.attach(f"预期结果：{str(expected_results)}\n实际结果：{new_actual_results}", '相等断言结果：成功',
-                              attachment_type=allure.attachment_type.TEXT)
+            if missing_keys:
+                flag += 1
+                self.missing_keys_failed('相等', expected_results, missing_keys)
+            elif eq_assert:
+                logs.info("相等断言成功：接口实际结果：%s，等于预期结果：%s", new_actual_results, expected_results)
+                attach_policy.attach(f"预期结果：{str(expected_results)}\n实际结果：{new_actual_results}", '相等断言结果：成功',
+                                     kind=TEXT)
             else:
                 flag += 1
-                logs.error(f"相等断言失败：接口实际结果{new_actual_results}，不等于预期结果：" + str(expected_results))
-                allure.attach(f"预期结果：{str(expected_results)}\n实际结果：{new_actual_results}", '相等断言结果：失败',
-                              attachment_type=allure.attachment_type.TEXT)
+                logs.error("相等断言失败：接口实际结果%s，不等于预期结果：%s", new_actual_results, expected_results)
+                attach_policy.attach(f"预期结果：{str(expected_results)}\n实际结果：{new_actual_results}", '相等断言结果：失败',
+                                     kind=TEXT)
         else:
             raise TypeError('相等断言--类型错误，预期结果和接口实际响应结果必须为字典类型！')
         return flag
 
-    def not_equal_assert(self, expected_results, actual_results, statuc_code=None):
+    def not_equal_assert(self, expected_results, actual_results, statuc_code=None, index=None):
         """
         不相等断言模式
-        :param expected_results: 预期结果，yaml文件validation值
+        :param expected_results: 预期结果，yaml文件validation值，key可以是响应数据中任意层级的字段
         :param actual_results: 接口实际响应结果
+        :param index: 响应数据的key索引，为None时新建
         :return:
         """
         flag = 0
         if isinstance(actual_results, dict) and isinstance(expected_results, dict):
-            # 找出实际结果与预期结果共同的key
-            common_keys = list(expected_results.keys() & actual_results.keys())[0]
-            # 根据相同的key去实际结果中获取，并重新生成一个实际结果的字典
-            new_actual_results = {common_keys: actual_results[common_keys]}
+            index = index or KeyIndex(actual_results)
+            # 按预期结果的key取实际结果（最外层不存在时取任意层级的第一个值），重新生成一个实际结果的字典
+            new_actual_results, missing_keys = self.pick_actual_results(expected_results, index)
             eq_assert = operator.ne(new_actual_results, expected_results)
-            if eq_assert:
-                logs.info(f"不相等断言成功：接口实际结果：{new_actual_results}，不等于预期结果：" + str(expected_results))
-                allure.attach(f"预期结果：{str(expected_results)}\n实际结果：{new_actual_results}", '不相等断言结果：成功',
-                              attachment_type=allure.attachment_type.TEXT)
+            if missing_keys:
+                flag += 1
+                self.missing_keys_failed('不相等', expected_results, missing_keys)
+            elif eq_assert:
+                logs.info("不相等断言成功：接口实际结果：%s，不等于预期结果：%s", new_actual_results, expected_results)
+                attach_policy.attach(f"预期结果：{str(expected_results)}\n实际结果：{new_actual_results}", '不相等断言结果：成功',
+                                     kind=TEXT)
             else:
                 flag += 1
-                logs.error(f"不相等断言失败：接口实际结果{new_actual_results}，等于预期结果：" + str(expected_results))
-                allure.attach(f"预期结果：{str(expected_results)}\n实际结果：{new_actual_results}", '不相等断言结果：失败',
-                              attachment_type=allure.attachment_type.TEXT)
+                logs.error("不相等断言失败：接口实际结果%s，等于预期结果：%s", new_actual_results, expected_results)
+                attach_policy.attach(f"预期结果：{str(expected_results)}\n实际结果：{new_actual_results}", '不相等断言结果：失败',
+                                     kind=TEXT)
         else:
             raise TypeError('不相等断言--类型错误，预期结果和接口实际响应结果必须为字典类型！')
         return flag
 
-    def assert_response_any(self, actual_results, expected_results):
+    def assert_response_any(self, actual_results, expected_results, index=None):
         """
         断言接口响应信息中的body的任何属性值
         :param actual_results: 接口实际响应信息
-        :param expected_results: 预期结果，在接口返回值的任意值
+        :param expected_results: 预期结果，在接口返回值的任意值，key可以是响应数据中任意层级的字段
+        :param index: 响应数据的key索引，为None时新建
         :return: 返回标识,0表示测试通过，非0则测试失败
         """
         flag = 0
         try:
-            exp_key = list(expected_results.keys())[0]
-            if exp_key in actual_results:
-                act_value = actual_results[exp_key]
-                rv_assert = operator.eq(act_value, list(expected_results.values())[0])
-                if rv_assert:
+            index = index or KeyIndex(actual_results)
+            for exp_key, exp_value in expected_results.items():
+                act_values = index.find(exp_key)
+                if any(operator.eq(act_value, exp_value) for act_value in act_values):
                     logs.info("响应结果任意值断言成功")
                 else:
                     flag += 1
-                    logs.error("响应结果任意值断言失败")
+                    logs.error("响应结果任意值断言失败：预期结果【%s: %s】,实际结果【%s】", exp_key, exp_value, act_values)
         except Exception as e:
             logs.error(e)
             raise
@@ -156,7 +210,7 @@ class Assertions:
             assert res_time < exp_time
             return True
         except Exception as e:
-            logs.error('接口响应时间[%ss]大于预期时间[%ss]' % (res_time, exp_time))
+            logs.error('接口响应时间[%ss]大于预期时间[%ss]', res_time, exp_time)
             raise
 
     def assert_mysql_data(self, expected_results):
@@ -166,8 +220,9 @@ class Assertions:
         :return: 返回flag标识，0表示正常，非0表示测试不通过
         """
         flag = 0
-        conn = ConnectMysql()
-        db_value = conn.query_all(expected_results)
+        # 从连接池借用连接，查询结束后自动归还
+        with ConnectMysql() as conn:
+            db_value = conn.query_all(expected_results)
         if db_value is not None:
             logs.info("数据库断言成功")
         else:
@@ -175,6 +230,40 @@ class Assertions:
             logs.error("数据库断言失败，请检查数据库是否存在该数据！")
         return flag
 
+    def assert_reconcile(self, expected_results, response):
+        """
+        对账断言：接口返回的列表数据与SQL查询结果按关键字段批量比对
+        YAML示例：
+          - reconcile:
+              rows: $.goodsList[*]          # 接口行数据的JSONPath
+              sql: select goods_id as goodsId, price from goods where status = 1
+              key: goodsId                  # 关键字段，多个时使用列表
+              columns: [price]              # 比对字段，可选，默认为两边共有的字段
+              source: mysql                 # 数据来源，mysql或clickhouse，默认mysql
+        :param expected_results: 对账配置
+        :param response: 接口实际响应结果
+        :return: 返回flag标识，0表示正常，非0表示测试不通过
+        """
+        keys = expected_results['key']
+        keys = [keys] if isinstance(keys, str) else list(keys)
+        api_frame = to_frame(jsonpath(response, expected_results['rows']))
+        source = expected_results.get('source', 'mysql').lower()
+        if source == 'clickhouse':
+            with ConnectClickHouse() as conn:
+                db_frame = conn.sql(expected_results['sql'])
+        else:
+            with ConnectMysql() as conn:
+                db_frame = conn.query_dataframe(expected_results['sql'])
+        if db_frame is None:
+            raise ValueError('对账断言SQL查询失败：%s' % expected_results['sql'])
+        result = reconcile_frames(api_frame, db_frame, keys, expected_results.get('columns'))
+        if result.ok:
+            logs.info("对账断言成功：%s", result.summary())
+            return 0
+        logs.error("对账断言失败：%s", result.summary())
+        attach_policy.attach(result.report(), '对账断言结果：失败', kind=TEXT)
+        return 1
+
     def assert_result(self, expected, response, status_code):
         """
         断言，通过断言all_flag标记，all_flag==0表示测试通过，否则为失败
@@ -184,34 +273,44 @@ class Assertions:
         :return:
         """
         all_flag = 0
+        start = time.perf_counter()
         try:
-            logs.info("yaml文件预期结果：%s" % expected)
+            logs.info("yaml文件预期结果：%s", expected)
             # logs.info("实际结果：%s" % response)
             # all_flag = 0
+            # 所有断言共享同一个key索引，响应数据最多只遍历一次
+            index = KeyIndex(response)
             for yq in expected:
                 for key, value in yq.items():
                     if key == "contains":
-                        flag = self.contains_assert(value, response, status_code)
+                        flag = self.contains_assert(value, response, status_code, index=index)
                         all_flag = all_flag + flag
                     elif key == "eq":
-                        flag = self.equal_assert(value, response)
+                        flag = self.equal_assert(value, response, index=index)
                         all_flag = all_flag + flag
                     elif key == 'ne':
-                        flag = self.not_equal_assert(value, response)
+                        flag = self.not_equal_assert(value, response, index=index)
                         all_flag = all_flag + flag
                     elif key == 'rv':
-                        flag = self.assert_response_any(actual_results=response, expected_results=value)
+                        flag = self.assert_response_any(actual_results=response, expected_results=value, index=index)
                         all_flag = all_flag + flag
                     elif key == 'db':
                         flag = self.assert_mysql_data(value)
                         all_flag = all_flag + flag
+                    elif key == 'reconcile':
+                        flag = self.assert_reconcile(value, response)
+                        all_flag = all_flag + flag
                     else:
                         logs.error("不支持此种断言方式")
 
         except Exception as exceptions:
             logs.error('接口断言异常，请检查yaml预期结果值是否正确填写!')
+            event_log.event('assert', status='error', error=str(exceptions))
             raise exceptions
 
+        event_log.event('assert', status='passed' if all_flag == 0 else 'failed', failed=all_flag,
+                        duration_ms=round((time.perf_counter() - start) * 1000, 3))
+
         if all_flag == 0:
             logs.info("测试成功")
             assert True
@@ -7,12 +7,17 @@
 import base64
 import calendar
 import datetime
+import functools
 import hashlib
+import importlib
+import inspect
 import os.path
 import random
 import re
+import threading
 import time
 from hashlib import sha1
+from conf import setting
 from conf.setting import DIR_BASE
 from pandas.tseries.offsets import Day
 from common.operationcsv import read_csv
@@ -20,6 +25,25 @@ from common.readyaml import ReadYamlData
 import csv
 
 
+@functools.lru_cache(maxsize=setting.DEBUGTALK_CACHE_SIZE)
+def _md5_hexdigest(params):
+    enc_data = hashlib.md5()
+    enc_data.update(params.encode(encoding="utf-8"))
+    return enc_data.hexdigest()
+
+
+@functools.lru_cache(maxsize=setting.DEBUGTALK_CACHE_SIZE)
+def _sha1_hexdigest(params):
+    enc_data = sha1()
+    enc_data.update(params.encode(encoding="utf-8"))
+    return enc_data.hexdigest()
+
+
+@functools.lru_cache(maxsize=setting.DEBUGTALK_CACHE_SIZE)
+def _base64_encode(params):
+    return base64.b64encode(params.encode("utf-8"))
+
+
 class DebugTalk:
     """
     动态数据生成工具类
@@ -54,8 +78,8 @@ class DebugTalk:
         Returns:
             str: 提取的数据
         """
-        data = self.read.get_extract_yaml(node_name)
         if randoms is not None and bool(re.compile(r'^[-+]?[0-9]*\.?[0-9]+([eE][-+]?[0-9]+)?$').match(randoms)):
+            data = self.read.get_extract_yaml(node_name)
             randoms = int(randoms)
             data_value = {
                 randoms: self.get_extract_order_data(data, randoms),
@@ -94,9 +118,7 @@ class DebugTalk:
         Returns:
             str: MD5加密后的字符串
         """
-        enc_data = hashlib.md5()
-        enc_data.update(params.encode(encoding="utf-8"))
-        return enc_data.hexdigest()
+        return _md5_hexdigest(params)
 
     def sha1_encryption(self, params):
         """
@@ -109,9 +131,7 @@ class DebugTalk:
         Returns:
             str: SHA1加密后的字符串
         """
-        enc_data = sha1()
-        enc_data.update(params.encode(encoding="utf-8"))
-        return enc_data.hexdigest()
+        return _sha1_hexdigest(params)
 
     def base64_encryption(self, params):
         """
@@ -124,9 +144,7 @@ class DebugTalk:
         Returns:
             bytes: Base64编码后的字节数据
         """
-        base_params = params.encode("utf-8")
-        encr = base64.b64encode(base_params)
-        return encr
+        return _base64_encode(params)
 
     def timestamp(self):
         """
@@ -269,3 +287,99 @@ class DebugTalk:
         conf = OperationConfig()
         url = conf.get_section_for_data('api_envi', host)
         return url
+
+
+class FunctionRegistry:
+    """
+    YAML占位符函数注册表
+    功能：
+    1. 会话内只创建一个DebugTalk实例，函数按名称解析一次后缓存绑定方法
+    2. 支持注册项目自定义的函数或模块，无需修改debugtalk.py，注册的函数优先于DebugTalk同名方法
+    3. setting.DEBUGTALK_MODULES中配置的模块在第一次解析函数时自动注册
+    """
+
+    def __init__(self, modules=None):
+        """
+        初始化FunctionRegistry类
+
+        Args:
+            modules (list, optional): 需要自动注册的模块路径，默认使用setting.DEBUGTALK_MODULES
+        """
+        self._modules = list(setting.DEBUGTALK_MODULES if modules is None else modules)
+        self._functions = {}
+        self._resolved = {}
+        self._debug_talk = None
+        self._lock = threading.Lock()
+
+    @property
+    def debug_talk(self):
+        """共享的DebugTalk实例"""
+        if self._debug_talk is None:
+            self._debug_talk = DebugTalk()
+        return self._debug_talk
+
+    def register(self, func=None, name=None):
+        """
+        注册函数，可作为装饰器使用：@function_registry.register 或 @function_registry.register(name='别名')
+
+        Args:
+            func (callable): 要注册的函数
+            name (str, optional): YAML中使用的函数名，默认为函数名
+
+        Returns:
+            原函数
+        """
+        if func is None:
+            return functools.partial(self.register, name=name)
+        with self._lock:
+            self._functions[name or func.__name__] = func
+            self._resolved.clear()
+        return func
+
+    def register_module(self, module):
+        """
+        注册模块或对象中所有公开的函数
+
+        Args:
+            module: 模块对象、模块路径字符串或对象实例
+        """
+        if isinstance(module, str):
+            module = importlib.import_module(module)
+        for name, func in inspect.getmembers(module, callable):
+            if name.startswith('_') or inspect.isclass(func):
+                continue
+            # 模块中只注册在该模块内定义的函数，跳过import进来的函数
+            if inspect.ismodule(module) and getattr(func, '__module__', None) != module.__name__:
+                continue
+            self.register(func, name=name)
+
+    def _load_modules(self):
+        """注册配置中的模块"""
+        modules, self._modules = self._modules, []
+        for module in modules:
+            self.register_module(module)
+
+    def resolve(self, func_name):
+        """
+        根据函数名获取可调用对象
+
+        Args:
+            func_name (str): YAML占位符中的函数名
+
+        Returns:
+            callable: 注册的函数或DebugTalk实例的绑定方法
+        """
+        func = self._resolved.get(func_name)
+        if func is not None:
+            return func
+        if self._modules:
+            self._load_modules()
+        func = self._functions.get(func_name)
+        if func is None:
+            func = getattr(self.debug_talk, func_name)
+        self._resolved[func_name] = func
+        return func
+
+
+# 会话内共享的函数注册表
+function_registry = FunctionRegistry()
@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+"""
+JSONPath表达式编译与求值
+功能：将YAML中使用的JSONPath表达式编译一次并缓存，支持在一次遍历中同时求值多个表达式
+支持的语法：$.a.b、$..key、[*]、.*、[n]（支持负数下标）、['key']
+其他语法（过滤、切片等）自动交给jsonpath库处理，返回值与jsonpath.jsonpath一致：匹配结果列表，未匹配时为False
+"""
+
+import functools
+import re
+
+try:
+    import jsonpath as jsonpath_lib
+except ImportError:
+    jsonpath_lib = None
+
+# 编译缓存最大数量
+JSONPATH_CACHE_SIZE = 2048
+
+_TOKEN = re.compile(r"""
+    (?P<desc>\.\.)?                       # 递归下降
+    (?:
+        \.?(?P<name>[^.\[\]'"*]+)         # .name
+      | \.?\*                             # .*
+      | \[\s*\*\s*\]                      # [*]
+      | \[\s*(?P<index>-?\d+)\s*\]        # [n]
+      | \[\s*(?P<quote>['"])(?P<key>.*?)(?P=quote)\s*\]  # ['key']
+    )
+""", re.X)
+
+
+class JsonPath:
+    """
+    编译好的JSONPath表达式
+    steps中的每一步为(类型, 参数)：child按key取值，index按下标取值，wild取所有子节点，desc递归查找key
+    """
+    __slots__ = ('expr', 'steps')
+
+    def __init__(self, expr, steps):
+        self.expr = expr
+        self.steps = steps
+
+    def find(self, document):
+        """
+        求值
+
+        Args:
+            document: 解析后的JSON数据
+
+        Returns:
+            list: 匹配结果，未匹配时为空列表
+        """
+        return _traverse(document, [self])[0]
+
+    def __repr__(self):
+        return 'JsonPath(%r)' % self.expr
+
+
+class FallbackJsonPath(JsonPath):
+    """不支持的语法交给jsonpath库求值"""
+    __slots__ = ()
+
+    def find(self, document):
+        if jsonpath_lib is None:
+            raise ValueError('不支持的JSONPath表达式：%s' % self.expr)
+        return jsonpath_lib.jsonpath(document, self.expr) or []
+
+
+def _parse(expr):
+    """将表达式解析为步骤列表，不支持的语法抛出ValueError"""
+    text = expr.strip()
+    if not text.startswith('$'):
+        raise ValueError(expr)
+    steps, pos = [], 1
+    while pos < len(text):
+        match = _TOKEN.match(text, pos)
+        if match is None or match.end() == pos:
+            raise ValueError(expr)
+        name = match.group('name')
+        if name is None:
+            name = match.group('key')
+        index = match.group('index')
+        if match.group('desc'):
+            if name is None:
+                raise ValueError(expr)
+            steps.append(('desc', name))
+        elif name is not None:
+            steps.append(('child', name))
+        elif index is not None:
+            steps.append(('index', int(index)))
+        else:
+            steps.append(('wild', None))
+        pos = match.end()
+    return tuple(steps)
+
+
+@functools.lru_cache(maxsize=JSONPATH_CACHE_SIZE)
+def compile_path(expr):
+    """
+    编译JSONPath表达式，结果按表达式缓存
+
+    Args:
+        expr (str): JSONPath表达式
+
+    Returns:
+        JsonPath: 编译好的表达式
+    """
+    try:
+        return JsonPath(expr, _parse(expr))
+    except ValueError:
+        return FallbackJsonPath(expr, None)
+
+
+def _traverse(document, paths):
+    """
+    一次深度优先遍历同时求值多个表达式
+    每个节点上先处理按key/下标/通配前进的状态，再处理递归下降的状态，匹配顺序与jsonpath库一致
+
+    Returns:
+        list: 每个表达式的匹配结果列表
+    """
+    results = [[] for _ in paths]
+    stack = [(document, [(pid, 0) for pid, path in enumerate(paths) if path.steps is not None])]
+    pop, push = stack.pop, stack.append
+    while stack:
+        node, states = pop()
+        if isinstance(node, dict):
+            children = node.values()
+        elif isinstance(node, list):
+            children = node
+        else:
+            # 标量节点只可能是某个表达式的最终匹配
+            for pid, i in states:
+                if i == len(paths[pid].steps):
+                    results[pid].append(node)
+            continue
+        advance, descend = [], None
+        for pid, i in states:
+            steps = paths[pid].steps
+            if i == len(steps):
+                results[pid].append(node)
+                continue
+            kind, arg = steps[i]
+            if kind == 'child':
+                if arg in node and isinstance(node, dict):
+                    advance.append((node[arg], [(pid, i + 1)]))
+            elif kind == 'index':
+                if isinstance(node, list) and -len(node) <= arg < len(node):
+                    advance.append((node[arg], [(pid, i + 1)]))
+            elif kind == 'wild':
+                next_state = [(pid, i + 1)]
+                advance.extend((child, next_state) for child in children)
+            else:
+                if isinstance(node, dict) and arg in node:
+                    advance.append((node[arg], [(pid, i + 1)]))
+                if descend is None:
+                    descend = [(child, [(pid, i)]) for child in children if isinstance(child, (dict, list))]
+                else:
+                    # 多个递归下降状态共享同一次子节点遍历
+                    for child_states in descend:
+                        child_states[1].append((pid, i))
+        # 后进先出：先压入递归下降的节点，再压入前进的节点
+        if descend:
+            for item in reversed(descend):
+                push(item)
+        for item in reversed(advance):
+            push(item)
+    for pid, path in enumerate(paths):
+        if path.steps is None:
+            results[pid] = path.find(document)
+    return results
+
+
+def find_many(document, exprs):
+    """
+    在一次遍历中求值多个表达式
+
+    Args:
+        document: 解析后的JSON数据
+        exprs (list): JSONPath表达式或编译好的JsonPath
+
+    Returns:
+        list: 与exprs一一对应的匹配结果，未匹配时为False
+    """
+    paths = [expr if isinstance(expr, JsonPath) else compile_path(expr) for expr in exprs]
+    return [found or False for found in _traverse(document, paths)]
+
+
+def jsonpath(document, expr):
+    """
+    与jsonpath.jsonpath用法一致的求值函数
+
+    Args:
+        document: 解析后的JSON数据
+        expr (str): JSONPath表达式
+
+    Returns:
+        list: 匹配结果，未匹配时为False
+    """
+    return find_many(document, [expr])[0]
+
+
+class KeyIndex:
+    """
+    响应数据的key索引
+    功能：第一次查询时遍历一次响应数据，建立key→所有值的索引（顺序与$..key一致），之后的查询直接读取索引
+    """
+    __slots__ = ('document', '_index')
+
+    def __init__(self, document):
+        self.document = document
+        self._index = None
+
+    def _build(self):
+        index = {}
+        stack = [self.document]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, dict):
+                for key, value in node.items():
+                    index.setdefault(key, []).append(value)
+                children = list(node.values())
+            elif isinstance(node, list):
+                children = node
+            else:
+                continue
+            stack.extend(child for child in reversed(children) if isinstance(child, (dict, list)))
+        return index
+
+    def find(self, key):
+        """
+        查找key在响应数据任意层级中的所有值，key不是单个字段名时按$..key的JSONPath求值
+
+        Args:
+            key (str): 字段名或JSONPath片段，如：token、data.token
+
+        Returns:
+            list: 所有匹配的值，未匹配时为空列表
+        """
+        if not isinstance(key, str) or any(char in key for char in '.[*'):
+            return compile_path('$..%s' % key).find(self.document)
+        if self._index is None:
+            self._index = self._build()
+        return self._index.get(key, [])
+
+    def get(self, key, default=None):
+        """
+        获取key的值：优先取最外层字段，不存在时取任意层级中第一个匹配的值
+
+        Args:
+            key (str): 字段名
+            default: 未找到时的返回值
+
+        Returns:
+            字段值
+        """
+        if isinstance(self.document, dict) and key in self.document:
+            return self.document[key]
+        found = self.find(key)
+        return found[0] if found else default
+
+
+if __name__ == '__main__':
+    # 基准测试：多MB响应数据上对比jsonpath库与编译后的表达式
+    import json
+    import timeit
+
+    doc = {'error_code': '0000', 'message': 'ok',
+           'goodsList': [{'goodsId': str(i), 'name': 'goods-%d' % i, 'price': i * 1.5,
+                          'sku': [{'skuId': '%d-%d' % (i, j), 'stock': j} for j in range(5)]}
+                         for i in range(20000)]}
+    print('响应大小：%.1fMB' % (len(json.dumps(doc)) / 1024 / 1024))
+    exprs = ['$.goodsList[*].goodsId', '$..error_code', '$..skuId', '$.goodsList[0].name']
+    for expr in exprs:
+        compiled = timeit.timeit(lambda: jsonpath(doc, expr), number=3) / 3
+        line = '%-24s 编译后%.1fms' % (expr, compiled * 1000)
+        if jsonpath_lib is not None:
+            assert jsonpath_lib.jsonpath(doc, expr) == jsonpath(doc, expr)
+            legacy = timeit.timeit(lambda: jsonpath_lib.jsonpath(doc, expr), number=1)
+            line += '，jsonpath库%.1fms，提升%.1f倍' % (legacy * 1000, legacy / compiled)
+        print(line)
+    many = timeit.timeit(lambda: find_many(doc, exprs), number=3) / 3
+    print('%d个表达式一次遍历：%.1fms' % (len(exprs), many * 1000))
+    keys = ['error_code', 'message', 'goodsId', 'skuId', 'stock', 'price', 'name', 'sku']
+
+    def index_lookup():
+        index = KeyIndex(doc)
+        return [index.find(key) for key in keys]
+
+    indexed = timeit.timeit(index_lookup, number=3) / 3
+    scanned = timeit.timeit(lambda: [jsonpath(doc, '$..%s' % key) for key in keys], number=3) / 3
+    print('%d个key：逐个$..key查找%.1fms，KeyIndex一次遍历%.1fms' % (len(keys), scanned * 1000, indexed * 1000))
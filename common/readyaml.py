@@ -4,15 +4,131 @@ YAML文件读写工具
 功能：提供YAML测试用例文件的读取、写入和解析功能
 """
 
+import hashlib
+import pickle
+import threading
 import yaml
 import traceback
 import os
 
 from common.recordlog import logs
+from common.variablecontext import variable_context
+from conf import setting
 from conf.operationConfig import OperationConfig
 from conf.setting import FILE_PATH
 from yaml.scanner import ScannerError
 
+# 优先使用libyaml的C语言解析器
+YamlLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+class CaseCache:
+    """
+    YAML用例解析缓存
+    功能：
+    1. 以二进制（pickle）形式缓存YAML文件的解析结果，缓存文件名为源文件绝对路径的哈希
+    2. 源文件的修改时间和大小未变化时直接使用缓存，变化时再比较内容哈希，内容未变也视为命中
+    3. 未命中时使用CSafeLoader解析并写入缓存，统计命中率
+    """
+
+    def __init__(self, cache_dir=FILE_PATH['CASE_CACHE'], enabled=setting.CASE_CACHE_ENABLED):
+        """
+        初始化CaseCache类
+
+        Args:
+            cache_dir (str): 缓存目录
+            enabled (bool): 是否启用缓存，关闭时每次都重新解析
+        """
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _cache_path(self, file):
+        name = hashlib.sha1(os.path.abspath(file).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, name + '.pickle')
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _write(self, cache_path, meta, data):
+        """先写临时文件再替换，避免多进程同时收集时读到不完整的缓存"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = '%s.%s.tmp' % (cache_path, os.getpid())
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(meta, f, protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+        except Exception:
+            logs.error(str(traceback.format_exc()))
+
+    def load(self, file):
+        """
+        读取YAML文件，优先使用缓存
+
+        Args:
+            file (str): YAML文件路径
+
+        Returns:
+            YAML解析结果，每次调用都返回新的对象
+        """
+        stat = os.stat(file)
+        if not self.enabled:
+            with open(file, 'r', encoding='utf-8') as f:
+                return yaml.load(f, Loader=YamlLoader)
+        cache_path = self._cache_path(file)
+        meta = None
+        try:
+            with open(cache_path, 'rb') as f:
+                meta = pickle.load(f)
+                if meta['mtime_ns'] == stat.st_mtime_ns and meta['size'] == stat.st_size:
+                    data = pickle.load(f)
+                    self._count(True)
+                    return data
+        except FileNotFoundError:
+            pass
+        except Exception:
+            meta = None
+        with open(file, 'rb') as f:
+            content = f.read()
+        digest = hashlib.sha1(content).hexdigest()
+        new_meta = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'digest': digest}
+        if meta is not None and meta.get('digest') == digest:
+            # 只是修改时间变化，内容未变
+            try:
+                with open(cache_path, 'rb') as f:
+                    pickle.load(f)
+                    data = pickle.load(f)
+                self._write(cache_path, new_meta, data)
+                self._count(True)
+                return data
+            except Exception:
+                pass
+        data = yaml.load(content.decode('utf-8'), Loader=YamlLoader)
+        self._write(cache_path, new_meta, data)
+        self._count(False)
+        return data
+
+    def stats(self):
+        """
+        获取缓存统计信息
+
+        Returns:
+            dict: 命中次数、未命中次数和命中率
+        """
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0}
+
+
+case_cache = CaseCache()
+
 
 def get_testcase_yaml(file):
     """
@@ -27,23 +143,22 @@ def get_testcase_yaml(file):
     """
     testcase_list = []
     try:
-        with open(file, 'r', encoding='utf-8') as f:
-            data = yaml.safe_load(f)
-            if len(data) <= 1:
-                yam_data = data[0]
-                base_info = yam_data.get('baseInfo')
-                for ts in yam_data.get('testCase'):
-                    param = [base_info, ts]
-                    testcase_list.append(param)
-                return testcase_list
-            else:
-                return data
+        data = case_cache.load(file)
+        if len(data) <= 1:
+            yam_data = data[0]
+            base_info = yam_data.get('baseInfo')
+            for ts in yam_data.get('testCase'):
+                param = [base_info, ts]
+                testcase_list.append(param)
+            return testcase_list
+        else:
+            return data
     except UnicodeDecodeError:
-        logs.error(f"[{file}]文件编码格式错误，--尝试使用utf-8编码解码YAML文件时发生了错误，请确保你的yaml文件是UTF-8格式！")
+        logs.error("[%s]文件编码格式错误，--尝试使用utf-8编码解码YAML文件时发生了错误，请确保你的yaml文件是UTF-8格式！", file)
     except FileNotFoundError:
-        logs.error(f'[{file}]文件未找到，请检查路径是否正确')
+        logs.error('[%s]文件未找到，请检查路径是否正确', file)
     except Exception as e:
-        logs.error(f'获取【{file}】文件数据时出现未知错误: {str(e)}')
+        logs.error('获取【%s】文件数据时出现未知错误: %s', file, e)
 
 
 class ReadYamlData:
@@ -85,8 +200,8 @@ class ReadYamlData:
 
     def write_yaml_data(self, value):
         """
-        写入YAML文件数据
-        功能：将数据写入extract.yaml文件，主要用于接口关联和数据提取
+        写入接口关联数据
+        功能：将数据写入内存变量上下文，由上下文在检查点或测试会话结束时统一保存到extract.yaml
         
         Args:
             value (dict): 要写入的数据，必须为字典格式
@@ -94,38 +209,25 @@ class ReadYamlData:
         Returns:
             None
         """
-
-        file = None
-        file_path = FILE_PATH['EXTRACT']
-        if not os.path.exists(file_path):
-            os.system(file_path)
-        try:
-            file = open(file_path, 'a', encoding='utf-8')  ##写入
-            if isinstance(value, dict):
-                write_data = yaml.dump(value, allow_unicode=True, sort_keys=False)
-                file.write(write_data)
-            else:
-                logs.info('写入[extract.yaml]的数据必须为dict格式')
-        except Exception:
-            logs.error(str(traceback.format_exc()))
-        finally:
-            file.close()
+        if isinstance(value, dict):
+            variable_context.update(value)
+        else:
+            logs.info('写入[extract.yaml]的数据必须为dict格式')
 
     def clear_yaml_data(self):
         """
         清空extract.yaml文件数据
-        功能：清空extract.yaml文件中的所有内容
+        功能：清空内存变量上下文和extract.yaml文件中的所有内容
         
         Returns:
             None
         """
-        with open(FILE_PATH['EXTRACT'], 'w') as f:
-            f.truncate()
+        variable_context.clear()
 
     def get_extract_yaml(self, node_name, second_node_name=None):
         """
         读取接口提取的变量值
-        功能：从extract.yaml文件中读取指定节点的数据
+        功能：从内存变量上下文中读取指定节点的数据
         
         Args:
             node_name (str): 要读取的节点名称
@@ -134,22 +236,16 @@ class ReadYamlData:
         Returns:
             提取的数据值
         """
-        if os.path.exists(FILE_PATH['EXTRACT']):
-            pass
-        else:
-            logs.error('extract.yaml不存在')
-            file = open(FILE_PATH['EXTRACT'], 'w')
-            file.close()
-            logs.info('extract.yaml创建成功！')
         try:
-            with open(FILE_PATH['EXTRACT'], 'r', encoding='utf-8') as rf:
-                ext_data = yaml.safe_load(rf)
-                if second_node_name is None:
-                    return ext_data[node_name]
-                else:
-                    return ext_data[node_name][second_node_name]
+            ext_data = variable_context.get(node_name)
+            if ext_data is None:
+                raise KeyError(node_name)
+            if second_node_name is None:
+                return ext_data
+            else:
+                return ext_data[second_node_name]
         except Exception as e:
-            logs.error(f"【extract.yaml】没有找到：{node_name},--%s" % e)
+            logs.error("【extract.yaml】没有找到：%s,--%s", node_name, e)
 
     def get_testCase_baseInfo(self, case_info):
         """
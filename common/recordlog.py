@@ -1,50 +1,177 @@
 import sys
 
 from conf import setting
+import atexit
+import contextvars
+import gzip
+import json
 import logging
 import os
+import queue
+import random
+import shutil
+import threading
 import time
+import uuid
 from logging.handlers import RotatingFileHandler  # 按文件大小滚动备份
-import datetime
+from logging.handlers import QueueHandler, QueueListener
 
 log_path = setting.FILE_PATH["LOG"]
 if not os.path.exists(log_path): os.mkdir(log_path)
-logfile_name = log_path + r"\test.{}.log".format(time.strftime("%Y%m%d"))
+logfile_name = os.path.join(log_path, "test.{}.log".format(time.strftime("%Y%m%d")))
+events_file_name = os.path.join(log_path, "events.{}.jsonl".format(time.strftime("%Y%m%d")))
+# 日志清理完成标记文件，每天一个，当天清理成功后才创建
+RETENTION_MARKER = os.path.join(log_path, '.retention.{}'.format(time.strftime("%Y%m%d")))
+# 日志清理锁文件，创建成功的进程执行清理，清理结束后删除
+RETENTION_LOCK = os.path.join(log_path, '.retention.lock')
+# 锁文件超过该时间仍存在时视为持有锁的进程已异常退出，单位：秒
+RETENTION_LOCK_TIMEOUT = 3600
+
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    有界队列日志处理器
+    功能：请求线程只把日志记录放入队列，消息格式化（%s参数拼接）和写文件都由后台线程完成；
+         队列已满时丢弃日志并计数，不阻塞请求线程
+    说明：日志参数在后台线程中才转换为字符串，传入的dict、list等参数在记录日志后不要再修改
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def prepare(self, record):
+        # 同一进程内传递记录，不需要像默认实现一样提前格式化消息
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
 
 
 class RecordLog:
     """日志模块"""
 
     def __init__(self):
-        self.handle_overdue_log()
+        self.queue_handler = None
+        self.listener = None
+        self.retention_thread = None
+        if self.retention_due():
+            # 日志清理在后台线程中执行，导入日志模块的耗时与历史日志数量无关；
+            # 非守护线程，进程退出前等待清理完成，不会在压缩中途被结束
+            self.retention_thread = threading.Thread(target=self.run_retention, name='log-retention')
+            self.retention_thread.start()
+
+    @staticmethod
+    def retention_due():
+        """
+        判断今天是否需要清理日志：只检查当天的标记文件和锁文件，耗时与历史日志数量无关
+        当天未清理成功且创建锁文件成功时返回True，多个进程同时启动时只有一个进程执行清理
+        """
+        if os.path.exists(RETENTION_MARKER):
+            return False
+        try:
+            if time.time() - os.stat(RETENTION_LOCK).st_mtime > RETENTION_LOCK_TIMEOUT:
+                # 持有锁的进程异常退出，锁文件未删除
+                os.remove(RETENTION_LOCK)
+        except OSError:
+            pass
+        try:
+            os.close(os.open(RETENTION_LOCK, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except OSError:
+            return False
+
+    def run_retention(self):
+        """执行日志清理，成功后创建当天的标记文件，最后释放锁文件"""
+        try:
+            if self.handle_overdue_log():
+                os.close(os.open(RETENTION_MARKER, os.O_CREAT | os.O_WRONLY))
+        except OSError as e:
+            sys.stderr.write('日志清理标记文件创建失败：%s\n' % e)
+        finally:
+            try:
+                os.remove(RETENTION_LOCK)
+            except OSError:
+                pass
+
+    def wait_retention(self):
+        """等待后台日志清理完成"""
+        if self.retention_thread is not None:
+            self.retention_thread.join()
+
+    @staticmethod
+    def compress_log(path):
+        """流式gzip压缩日志文件，先写临时文件再替换，压缩完成后删除原文件"""
+        tmp_path = path + '.gz.tmp'
+        st = os.stat(path)
+        with open(path, 'rb') as src, gzip.open(tmp_path, 'wb') as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        # 保留原文件的修改时间，过期清理和按大小清理仍按日志的实际时间计算
+        os.utime(tmp_path, (st.st_atime, st.st_mtime))
+        os.replace(tmp_path, path + '.gz')
+        os.remove(path)
 
     def handle_overdue_log(self):
-        """处理过期日志文件"""
-        # 获取系统的当前时间
-        now_time = datetime.datetime.now()
-        # 日期偏移30天，最多保留30的日志文件，超过自动清理
-        offset_date = datetime.timedelta(days=-30)
-        # 获取前一天时间戳
-        before_date = (now_time + offset_date).timestamp()
-        # 找到目录下的文件
-        files = os.listdir(log_path)
-        for file in files:
-            if os.path.splitext(file)[1]:
-                filepath = log_path + "\\" + file
-                file_create_time = os.path.getctime(filepath)  # 获取文件创建时间,返回时间戳
-                # dateArray = datetime.datetime.fromtimestamp(file_createtime) #标准时间格式
-                # print(dateArray.strftime("%Y--%m--%d %H:%M:%S"))
-                if file_create_time < before_date:
-                    os.remove(filepath)
-                else:
-                    continue
+        """
+        处理过期日志文件
+        1. 压缩往日的日志，当天的日志及其滚动备份由RotatingFileHandler管理，不压缩也不删除
+        2. 删除修改时间超过LOG_RETENTION_DAYS天的日志
+        3. 日志总大小超过LOG_RETENTION_MAX_MB时，从最旧的日志开始删除
+
+        Returns:
+            bool: 清理是否成功
+        """
+        try:
+            # 当天的日志和滚动备份（test.<日期>.log.1等）可能正在被其他进程滚动改名
+            active = (os.path.basename(logfile_name), os.path.basename(events_file_name))
+            before_date = time.time() - setting.LOG_RETENTION_DAYS * 86400
+            files = []
+            with os.scandir(log_path) as entries:
+                for entry in entries:
+                    if (not entry.is_file() or entry.name.startswith(active)
+                            or entry.path in (RETENTION_MARKER, RETENTION_LOCK)):
+                        continue
+                    if entry.name.startswith('.retention.'):
+                        # 往日的清理标记文件
+                        os.remove(entry.path)
+                        continue
+                    if entry.name.endswith('.gz.tmp'):
+                        # 上次压缩中断留下的临时文件
+                        os.remove(entry.path)
+                        continue
+                    stat = entry.stat()
+                    if stat.st_mtime < before_date:
+                        os.remove(entry.path)
+                        continue
+                    path = entry.path
+                    if setting.LOG_COMPRESS and not entry.name.endswith('.gz'):
+                        self.compress_log(path)
+                        path += '.gz'
+                        stat = os.stat(path)
+                    files.append((stat.st_mtime, stat.st_size, path))
+            max_bytes = setting.LOG_RETENTION_MAX_MB * 1024 * 1024
+            total = sum(size for _, size, _ in files)
+            for _, size, path in sorted(files):
+                if total <= max_bytes:
+                    break
+                os.remove(path)
+                total -= size
+            return True
+        except Exception as e:
+            sys.stderr.write('日志清理异常：%s\n' % e)
+            return False
 
     def output_logging(self):
         """获取logger对象"""
         logger = logging.getLogger(__name__)
         # 防止重复打印日志
         if not logger.handlers:
-            logger.setLevel(setting.LOG_LEVEL)
+            logger.setLevel(min(setting.LOG_LEVEL, setting.STREAM_LOG_LEVEL))
             log_format = logging.Formatter(
                 '%(levelname)s - %(asctime)s - %(filename)s:%(lineno)d -[%(module)s:%(funcName)s] - %(message)s')
             # 日志输出到指定文件，滚动备份日志
@@ -54,16 +181,155 @@ class RecordLog:
 
             fh.setLevel(setting.LOG_LEVEL)
             fh.setFormatter(log_format)
-            # 将相应的handler添加在logger对象中
-            logger.addHandler(fh)
 
             # 输出到控制台
             sh = logging.StreamHandler()
             sh.setLevel(setting.STREAM_LOG_LEVEL)
             sh.setFormatter(log_format)
-            logger.addHandler(sh)
+
+            if setting.LOG_ASYNC:
+                # 日志记录放入队列，由后台线程按各自的级别写入文件和控制台
+                self.queue_handler = BoundedQueueHandler(queue.Queue(maxsize=setting.LOG_QUEUE_SIZE))
+                self.listener = QueueListener(self.queue_handler.queue, fh, sh, respect_handler_level=True)
+                self.listener.start()
+                logger.addHandler(self.queue_handler)
+                atexit.register(self.stop)
+            else:
+                # 将相应的handler添加在logger对象中
+                logger.addHandler(fh)
+                logger.addHandler(sh)
         return logger
 
+    def stop(self):
+        """停止后台写日志线程，写完队列中剩余的日志并输出丢弃的日志数量"""
+        if self.listener is None:
+            return
+        self.listener.stop()
+        self.listener = None
+        if self.queue_handler.dropped:
+            sys.stderr.write('日志队列已满，共丢弃%s条日志\n' % self.queue_handler.dropped)
+
+
+class JsonLineFormatter(logging.Formatter):
+    """结构化日志格式：record.msg为事件字典，在后台线程中序列化为一行JSON"""
+
+    def format(self, record):
+        return json.dumps(record.msg, ensure_ascii=False, default=str)
+
+
+class CaseTrace:
+    """一条测试用例的追踪信息：用例ID、开始时间、是否抽样记录报文以及暂存的报文"""
+    __slots__ = ('case_id', 'test', 'start', 'sampled', 'bodies')
+
+    def __init__(self, test):
+        self.case_id = uuid.uuid4().hex[:16]
+        self.test = test
+        self.start = time.perf_counter()
+        self.sampled = random.random() < setting.STRUCTURED_LOG_SAMPLE_RATE
+        self.bodies = []
+
+
+case_context = contextvars.ContextVar('case_context', default=None)
+
+
+class EventLog:
+    """
+    结构化日志
+    功能：
+    1. 每个事件写入一行JSON：时间、用例ID、阶段（case_start/request/response/assert/case_end）以及耗时、状态、报文大小等字段
+    2. 用例ID保存在contextvar中，同一条用例的所有事件共享一个case_id，可直接按case_id过滤
+    3. 完整报文先暂存在用例中，用例失败或被抽样时才在case_end事件中写出
+    4. 与文本日志一样由后台线程序列化和写文件，未启用时所有方法直接返回
+    """
+
+    def __init__(self, enabled=setting.STRUCTURED_LOG):
+        self.enabled = enabled
+        self.logger = logging.getLogger(__name__ + '.events')
+        self.logger.propagate = False
+        self.queue_handler = None
+        self.listener = None
+        if enabled and not self.logger.handlers:
+            self.logger.setLevel(logging.INFO)
+            fh = RotatingFileHandler(filename=events_file_name, mode='a', maxBytes=52428800, backupCount=7,
+                                     encoding='utf-8')
+            fh.setFormatter(JsonLineFormatter())
+            self.queue_handler = BoundedQueueHandler(queue.Queue(maxsize=setting.LOG_QUEUE_SIZE))
+            self.listener = QueueListener(self.queue_handler.queue, fh)
+            self.listener.start()
+            self.logger.addHandler(self.queue_handler)
+            atexit.register(self.stop)
+
+    def stop(self):
+        """停止后台写日志线程"""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def event(self, phase, **fields):
+        """
+        记录一个事件
+
+        Args:
+            phase (str): 阶段，如request、response、assert
+            **fields: 事件字段，如api、status、duration_ms、req_bytes、resp_bytes
+        """
+        if not self.enabled:
+            return
+        trace = case_context.get()
+        record = {'ts': round(time.time(), 3), 'case_id': trace.case_id if trace else None, 'phase': phase}
+        record.update(fields)
+        self.logger.info(record)
+
+    def add_bodies(self, url, request_body, response_body):
+        """暂存完整报文，用例结束时按失败/抽样规则决定是否写出"""
+        trace = case_context.get()
+        if not self.enabled or trace is None:
+            return
+        if not (trace.sampled or setting.STRUCTURED_LOG_BODY_ON_FAILURE):
+            return
+        limit = setting.STRUCTURED_LOG_BODY_LIMIT
+        if isinstance(request_body, bytes):
+            request_body = request_body.decode('utf-8', errors='replace')
+        trace.bodies.append({'url': url, 'request': request_body[:limit] if request_body else request_body,
+                             'response': response_body[:limit] if response_body else response_body})
+
+    def start_case(self, test):
+        """
+        开始一条用例，之后记录的事件都带有该用例的case_id
+
+        Args:
+            test (str): 用例标识，如pytest的nodeid
+
+        Returns:
+            contextvars.Token: 传给end_case
+        """
+        if not self.enabled:
+            return None
+        trace = CaseTrace(test)
+        token = case_context.set(trace)
+        self.event('case_start', test=test)
+        return token
+
+    def end_case(self, token, status):
+        """
+        结束一条用例，失败或被抽样时写出暂存的完整报文
+
+        Args:
+            token (contextvars.Token): start_case的返回值
+            status (str): 用例结果，如passed、failed、skipped
+        """
+        if token is None:
+            return
+        trace = case_context.get()
+        fields = {'test': trace.test, 'status': status,
+                  'duration_ms': round((time.perf_counter() - trace.start) * 1000, 3)}
+        failed = status not in ('passed', 'skipped')
+        if trace.bodies and (trace.sampled or (failed and setting.STRUCTURED_LOG_BODY_ON_FAILURE)):
+            fields['bodies'] = trace.bodies
+        self.event('case_end', **fields)
+        case_context.reset(token)
+
 
 apilog = RecordLog()
 logs = apilog.output_logging()
+event_log = EventLog()
@@ -57,13 +57,13 @@ class SendEmail(object):
             service.login(self.__user, self.__passwd)
             service.sendmail(user, addressee, message.as_string())
         except smtplib.SMTPConnectError as e:
-            logs.error('邮箱服务器连接失败！', e)
+            logs.error('邮箱服务器连接失败！%s', e)
         except smtplib.SMTPAuthenticationError as e:
-            logs.error('邮箱服务器认证错误,POP3/SMTP服务未开启,密码应填写授权码!', e)
+            logs.error('邮箱服务器认证错误,POP3/SMTP服务未开启,密码应填写授权码!%s', e)
         except smtplib.SMTPSenderRefused as e:
-            logs.error('发件人地址未经验证！', e)
+            logs.error('发件人地址未经验证！%s', e)
         except smtplib.SMTPDataError as e:
-            logs.error('发送的邮件内容包含了未被许可的信息，或被系统识别为垃圾邮件！', e)
+            logs.error('发送的邮件内容包含了未被许可的信息，或被系统识别为垃圾邮件！%s', e)
         except Exception as e:
             logs.error(e)
         else:
@@ -4,20 +4,140 @@ HTTP请求发送器
 功能：封装HTTP请求发送功能，支持GET、POST等方法，提供请求日志记录和响应处理
 """
 
+import http.cookiejar
 import json
-import allure
+import threading
 import pytest
 import requests
 import urllib3
 import time
+from urllib.parse import urlsplit
 
 from conf import setting
-from common.recordlog import logs
+from common.allureattach import attach_policy, BODY
+from common.apiresponse import ApiResponse
+from common.recordlog import logs, event_log
 from requests import utils
+from requests.adapters import HTTPAdapter
 from common.readyaml import ReadYamlData
 from requests.packages.urllib3.exceptions import InsecureRequestWarning
 
 
+class SessionPool:
+    """
+    HTTP会话连接池
+    功能：
+    1. 按host（协议+域名+端口）缓存requests.Session，所有用例共享，复用TCP/TLS连接
+    2. 可配置每个host的连接池大小、keep-alive开关
+    3. 会话空闲时间超过max_idle后自动关闭并重建
+    4. 统计会话命中/未命中次数以及底层连接的创建次数，便于确认连接复用情况
+    5. 共享会话的Cookie策略拒绝所有域名，服务端下发的Cookie不会存入会话，每个请求只发送自己传入的cookies，
+       并发执行的用例之间不会互相带上对方的Cookie
+    """
+
+    def __init__(self, pool_connections=setting.POOL_CONNECTIONS, pool_maxsize=setting.POOL_MAXSIZE,
+                 keep_alive=setting.POOL_KEEP_ALIVE, max_idle=setting.POOL_MAX_IDLE):
+        """
+        初始化SessionPool类
+
+        Args:
+            pool_connections (int): 每个会话缓存的host连接池数量
+            pool_maxsize (int): 每个host连接池保留的最大连接数
+            keep_alive (bool): 是否启用keep-alive长连接
+            max_idle (int): 会话最大空闲时间，单位：秒
+        """
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.keep_alive = keep_alive
+        self.max_idle = max_idle
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _host_key(url):
+        """根据url获取连接池的key：协议+域名+端口"""
+        parts = urlsplit(url)
+        return '%s://%s' % (parts.scheme.lower(), parts.netloc.lower())
+
+    def _new_session(self):
+        """创建挂载了连接池适配器的会话"""
+        session = requests.session()
+        adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers['Connection'] = 'keep-alive' if self.keep_alive else 'close'
+        session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+        return session
+
+    def get_session(self, url):
+        """
+        获取url对应host的共享会话
+        功能：命中且未超过最大空闲时间则直接复用，否则新建会话
+
+        Args:
+            url (str): 请求地址
+
+        Returns:
+            requests.Session: 共享会话对象
+        """
+        key = self._host_key(url)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is not None and now - entry[1] > self.max_idle:
+                entry[0].close()
+                self.evictions += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                session = self._new_session()
+            else:
+                self.hits += 1
+                session = entry[0]
+            self._sessions[key] = (session, now)
+        return session
+
+    def stats(self):
+        """
+        获取连接池统计信息
+
+        Returns:
+            dict: hits/misses为会话命中与未命中次数，evictions为空闲淘汰次数，
+                  connections为底层新建的TCP连接数，requests为通过连接池发送的请求数
+        """
+        connections = requests_count = 0
+        with self._lock:
+            for session, _ in self._sessions.values():
+                for adapter in set(session.adapters.values()):
+                    pools = adapter.poolmanager.pools
+                    for pool_key in pools.keys():
+                        pool = pools[pool_key]
+                        connections += pool.num_connections
+                        requests_count += pool.num_requests
+            return {
+                'hosts': len(self._sessions),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'connections': connections,
+                'requests': requests_count
+            }
+
+    def close(self):
+        """关闭所有会话，释放连接"""
+        with self._lock:
+            for session, _ in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+# 全局共享的会话连接池，所有SendRequest实例复用
+session_pool = SessionPool()
+
+
 class SendRequest:
     """
     HTTP请求发送器类
@@ -54,10 +174,11 @@ class SendRequest:
         """
         requests.packages.urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
         try:
+            session = session_pool.get_session(url)
             if data is None:
-                response = requests.get(url, headers=header, cookies=self.cookie, verify=False)
+                response = session.get(url, headers=header, cookies=self.cookie, verify=False)
             else:
-                response = requests.get(url, data, headers=header, cookies=self.cookie, verify=False)
+                response = session.get(url, params=data, headers=header, cookies=self.cookie, verify=False)
         except requests.RequestException as e:
             logs.error(e)
             return None
@@ -98,10 +219,11 @@ class SendRequest:
         # 控制台输出InsecureRequestWarning错误
         requests.packages.urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
         try:
+            session = session_pool.get_session(url)
             if data is None:
-                response = requests.post(url, header, cookies=self.cookie, verify=False)
+                response = session.post(url, headers=header, cookies=self.cookie, verify=False)
             else:
-                response = requests.post(url, data, headers=header, cookies=self.cookie, verify=False)
+                response = session.post(url, data, headers=header, cookies=self.cookie, verify=False)
         except requests.RequestException as e:
             logs.error(e)
             return None
@@ -128,36 +250,76 @@ class SendRequest:
     def send_request(self, **kwargs):
         """
         发送HTTP请求的通用方法
-        功能：使用requests.session发送请求，自动处理Cookie和异常
+        功能：使用按host共享的连接池会话发送请求，自动处理Cookie和异常
         
         Args:
             **kwargs: requests.request()方法的所有参数
             
         Returns:
-            requests.Response: HTTP响应对象
+            ApiResponse: 包装后的HTTP响应对象，响应体只解析一次
         """
-        session = requests.session()
+        session = session_pool.get_session(kwargs['url'])
         result = None
         cookie = {}
         try:
-            result = session.request(**kwargs)
+            result = ApiResponse(session.request(**kwargs))
+            if event_log.enabled:
+                request_body = result.request.body
+                event_log.event('response', url=kwargs['url'], status=result.status_code,
+                                duration_ms=round(result.elapsed.total_seconds() * 1000, 3),
+                                req_bytes=len(request_body) if request_body else 0, resp_bytes=len(result.content))
+                event_log.add_bodies(kwargs['url'], request_body, result.text)
             # 提取响应中的Cookie并保存
             set_cookie = requests.utils.dict_from_cookiejar(result.cookies)
             if set_cookie:
                 cookie['Cookie'] = set_cookie
                 self.read.write_yaml_data(cookie)
-                logs.info("cookie：%s" % cookie)
-            logs.info("接口返回信息：%s" % result.text if result.text else result)
+                logs.info("cookie：%s", cookie)
+            logs.info("接口返回信息：%s", result.text if result.text else result)
         except requests.exceptions.ConnectionError:
             logs.error("ConnectionError--连接异常")
+            event_log.event('response', url=kwargs['url'], status='ConnectionError')
             pytest.fail("接口请求异常，可能是request的连接数过多或请求速度过快导致程序报错！")
         except requests.exceptions.HTTPError:
             logs.error("HTTPError--http异常")
         except requests.exceptions.RequestException as e:
             logs.error(e)
+            event_log.event('response', url=kwargs['url'], status=type(e).__name__)
             pytest.fail("请求异常，请检查系统或数据是否正常！")
         return result
 
+    def record_request(self, name, url, case_name, header, method, cookies=None, attach=True, **kwargs):
+        """
+        记录接口请求日志
+        功能：输出接口请求信息到日志，并可选地将请求参数写入Allure报告
+
+        Args:
+            name (str): 接口名称
+            url (str): 接口地址
+            case_name (str): 测试用例名称
+            header (dict): 请求头
+            method (str): 请求方法（GET、POST等）
+            cookies (dict, optional): Cookie信息，默认为空
+            attach (bool): 是否将请求参数写入Allure报告，非主线程发送请求时应为False
+            **kwargs: 其他请求参数，根据YAML文件的参数类型
+        """
+        event_log.event('request', api=name, case_name=case_name, method=method, url=url)
+        try:
+            # 收集报告日志
+            logs.info('接口名称：%s', name)
+            logs.info('请求地址：%s', url)
+            logs.info('请求方式：%s', method)
+            logs.info('测试用例名称：%s', case_name)
+            logs.info('请求头：%s', header)
+            logs.info('Cookie：%s', cookies)
+            if "data" in kwargs.keys() or "json" in kwargs.keys() or "params" in kwargs.keys():
+                if attach and attach_policy.enabled:
+                    req_params = json.dumps(kwargs, ensure_ascii=False)
+                    attach_policy.attach(req_params, '请求参数', kind=BODY)
+                logs.info("请求参数：%s", kwargs)
+        except Exception as e:
+            logs.error(e)
+
     def run_main(self, name, url, case_name, header, method, cookies=None, file=None, **kwargs):
         """
         接口请求主方法
@@ -176,27 +338,7 @@ class SendRequest:
         Returns:
             requests.Response: HTTP响应对象
         """
-
-        try:
-            # 收集报告日志
-            logs.info('接口名称：%s' % name)
-            logs.info('请求地址：%s' % url)
-            logs.info('请求方式：%s' % method)
-            logs.info('测试用例名称：%s' % case_name)
-            logs.info('请求头：%s' % header)
-            logs.info('Cookie：%s' % cookies)
-            req_params = json.dumps(kwargs, ensure_ascii=False)
-            if "data" in kwargs.keys():
-                allure.attach(req_params, '请求参数', allure.attachment_type.TEXT)
-                logs.info("请求参数：%s" % kwargs)
-            elif "json" in kwargs.keys():
-                allure.attach(req_params, '请求参数', allure.attachment_type.TEXT)
-                logs.info("请求参数：%s" % kwargs)
-            elif "params" in kwargs.keys():
-                allure.attach(req_params, '请求参数', allure.attachment_type.TEXT)
-                logs.info("请求参数：%s" % kwargs)
-        except Exception as e:
-            logs.error(e)
+        self.record_request(name, url, case_name, header, method, cookies=cookies, **kwargs)
         # time.sleep(0.5)
         requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
         response = self.send_request(method=method,
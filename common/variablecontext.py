@@ -0,0 +1,378 @@
+# -*- coding: utf-8 -*-
+"""
+接口关联变量上下文
+功能：保存接口提取的变量，支持两种存储方式
+1. VariableContext：内存字典，只在检查点或测试会话结束时将去重后的快照写入extract.yaml
+2. SqliteVariableContext：SQLite（WAL模式）共享库，pytest-xdist多进程运行时各worker安全地读写
+两种存储都支持按用例场景划分命名空间：with variable_context.scope('场景名'): ...，退出场景时执行一次检查点
+"""
+
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+import traceback
+
+import yaml
+
+from common.recordlog import logs
+from conf import setting
+from conf.setting import FILE_PATH
+
+
+# 所有worker共享的命名空间，场景外提取的变量写入这里，其他worker的用例可以读取
+SHARED_NAMESPACE = 'shared'
+# 记录本次运行ID的命名空间，同一次xdist运行只清空一次共享变量
+RUN_NAMESPACE = 'run'
+
+
+def current_worker():
+    """获取当前pytest-xdist的worker编号，非多进程运行时为master"""
+    return os.environ.get('PYTEST_XDIST_WORKER', 'master')
+
+
+class ScopedContextMixin:
+    """
+    场景命名空间
+    功能：scope()期间写入的变量只属于该场景，读取时优先查找场景内的变量，退出场景时调用checkpoint()
+    """
+
+    def _init_scope(self):
+        self._local = threading.local()
+
+    @property
+    def current_scope(self):
+        """当前线程所在的场景名称，未进入场景时为None"""
+        return getattr(self._local, 'scope', None)
+
+    @contextlib.contextmanager
+    def scope(self, name):
+        """
+        进入场景命名空间
+
+        Args:
+            name (str): 场景名称
+        """
+        previous = self.current_scope
+        self._local.scope = name
+        try:
+            yield self
+        finally:
+            self._local.scope = previous
+            self.checkpoint()
+
+
+class VariableContext(ScopedContextMixin):
+    """
+    接口关联变量上下文类
+    功能：
+    1. 首次访问时加载一次extract.yaml，之后的读写都在内存字典中完成
+    2. 同名变量直接覆盖，文件中不再出现重复的key
+    3. 每写入flush_interval次或调用flush()时，原子地写入完整快照
+    """
+
+    def __init__(self, file_path=FILE_PATH['EXTRACT'], flush_interval=setting.EXTRACT_FLUSH_INTERVAL):
+        """
+        初始化VariableContext类
+
+        Args:
+            file_path (str): 快照文件路径，默认为extract.yaml
+            flush_interval (int): 每写入多少次后自动保存快照，0表示不自动保存
+        """
+        self.file_path = file_path
+        self.flush_interval = flush_interval
+        self._data = None
+        self._scoped = {}
+        self._pending = 0
+        self._lock = threading.RLock()
+        self._init_scope()
+
+    def _load(self):
+        """首次访问时从快照文件加载变量"""
+        if self._data is not None:
+            return self._data
+        self._data = {}
+        if os.path.exists(self.file_path):
+            try:
+                with open(self.file_path, 'r', encoding='utf-8') as rf:
+                    self._data = yaml.safe_load(rf) or {}
+            except Exception:
+                logs.error(str(traceback.format_exc()))
+        else:
+            logs.error('extract.yaml不存在')
+        return self._data
+
+    def _target(self):
+        """当前写入的字典：场景内写入场景字典，否则写入全局字典"""
+        scope = self.current_scope
+        if scope is None:
+            return self._load()
+        return self._scoped.setdefault(scope, {})
+
+    def get(self, node_name, default=None):
+        """
+        读取变量
+
+        Args:
+            node_name (str): 变量名
+            default: 变量不存在时的默认值
+
+        Returns:
+            变量值
+        """
+        with self._lock:
+            scoped = self._scoped.get(self.current_scope)
+            if scoped and node_name in scoped:
+                return scoped[node_name]
+            return self._load().get(node_name, default)
+
+    def __contains__(self, node_name):
+        return self.get(node_name) is not None
+
+    def update(self, value):
+        """
+        写入变量，同名变量直接覆盖
+
+        Args:
+            value (dict): 要写入的变量
+        """
+        with self._lock:
+            self._target().update(value)
+            self._pending += 1
+            if self.flush_interval and self._pending >= self.flush_interval:
+                self.flush()
+
+    def atomic_update(self, node_name, func, default=None):
+        """
+        原子地读取、修改并写回变量
+
+        Args:
+            node_name (str): 变量名
+            func (callable): 接收旧值返回新值的函数
+            default: 变量不存在时传给func的旧值
+
+        Returns:
+            新值
+        """
+        with self._lock:
+            value = func(self.get(node_name, default))
+            self.update({node_name: value})
+            return value
+
+    def snapshot(self):
+        """获取当前所有变量的浅拷贝"""
+        with self._lock:
+            return dict(self._load())
+
+    def clear(self):
+        """清空所有变量并清空快照文件"""
+        with self._lock:
+            self._data = {}
+            self._scoped.clear()
+            self._pending = 0
+            with open(self.file_path, 'w') as f:
+                f.truncate()
+
+    def flush(self):
+        """
+        保存快照
+        功能：先写入临时文件再替换extract.yaml，避免其他进程读到写了一半的文件
+        """
+        with self._lock:
+            if self._data is None:
+                return
+            tmp_path = self.file_path + '.tmp'
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as wf:
+                    yaml.dump(self._data, wf, allow_unicode=True, sort_keys=False)
+                os.replace(tmp_path, self.file_path)
+                self._pending = 0
+            except Exception:
+                logs.error(str(traceback.format_exc()))
+
+    def checkpoint(self):
+        """检查点：有未保存的变量时保存快照"""
+        with self._lock:
+            if self._pending:
+                self.flush()
+
+
+class SqliteVariableContext(ScopedContextMixin):
+    """
+    多进程共享的接口关联变量上下文类
+    功能：
+    1. 变量保存在WAL模式的SQLite库中，多个进程可以同时读写
+    2. 场景外写入的变量保存在所有worker共享的命名空间中，gw0提取的变量gw1的用例也能读取；
+       场景内写入的变量保存在“worker:场景名”命名空间中，只对当前worker的该场景可见，读取时再回退到共享命名空间
+    3. 每次写入都在一个事务中完成，atomic_update使用BEGIN IMMEDIATE保证读-改-写的原子性
+    4. flush()将共享变量快照写入extract.yaml（worker进程写入extract.<worker>.yaml）
+    """
+
+    def __init__(self, db_path=FILE_PATH['EXTRACT_DB'], file_path=FILE_PATH['EXTRACT'], namespace=None):
+        """
+        初始化SqliteVariableContext类
+
+        Args:
+            db_path (str): SQLite库文件路径
+            file_path (str): 快照文件路径，默认为extract.yaml
+            namespace (str, optional): 场景命名空间的前缀，默认为当前worker编号
+        """
+        self.db_path = db_path
+        self.namespace = namespace or current_worker()
+        if self.namespace == 'master':
+            self.file_path = file_path
+        else:
+            self.file_path = '%s.%s%s' % (os.path.splitext(file_path)[0], self.namespace,
+                                          os.path.splitext(file_path)[1])
+        self._connections = threading.local()
+        self._init_scope()
+        with self._transaction() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS variables ('
+                         'namespace TEXT NOT NULL, name TEXT NOT NULL, value TEXT, '
+                         'PRIMARY KEY (namespace, name)) WITHOUT ROWID')
+
+    @property
+    def _conn(self):
+        """每个线程使用独立的数据库连接"""
+        conn = getattr(self._connections, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._connections.conn = conn
+        return conn
+
+    @contextlib.contextmanager
+    def _transaction(self, immediate=False):
+        """开启事务，immediate为True时立即获取写锁"""
+        conn = self._conn
+        conn.execute('BEGIN IMMEDIATE' if immediate else 'BEGIN')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        else:
+            conn.execute('COMMIT')
+
+    def _namespaces(self):
+        """读取变量时依次查找的命名空间"""
+        scope = self.current_scope
+        if scope is None:
+            return [SHARED_NAMESPACE]
+        return ['%s:%s' % (self.namespace, scope), SHARED_NAMESPACE]
+
+    def _get(self, conn, node_name, default=None):
+        for namespace in self._namespaces():
+            row = conn.execute('SELECT value FROM variables WHERE namespace=? AND name=?',
+                               (namespace, node_name)).fetchone()
+            if row is not None:
+                return json.loads(row[0])
+        return default
+
+    def _put(self, conn, value):
+        namespace = self._namespaces()[0]
+        conn.executemany('INSERT OR REPLACE INTO variables (namespace, name, value) VALUES (?, ?, ?)',
+                         [(namespace, key, json.dumps(val, ensure_ascii=False, default=str))
+                          for key, val in value.items()])
+
+    def get(self, node_name, default=None):
+        """
+        读取变量
+
+        Args:
+            node_name (str): 变量名
+            default: 变量不存在时的默认值
+
+        Returns:
+            变量值
+        """
+        return self._get(self._conn, node_name, default)
+
+    def __contains__(self, node_name):
+        return self.get(node_name) is not None
+
+    def update(self, value):
+        """
+        写入变量，同名变量直接覆盖
+
+        Args:
+            value (dict): 要写入的变量
+        """
+        with self._transaction(immediate=True) as conn:
+            self._put(conn, value)
+
+    def atomic_update(self, node_name, func, default=None):
+        """
+        原子地读取、修改并写回变量，多个进程同时调用时不会丢失更新
+
+        Args:
+            node_name (str): 变量名
+            func (callable): 接收旧值返回新值的函数
+            default: 变量不存在时传给func的旧值
+
+        Returns:
+            新值
+        """
+        with self._transaction(immediate=True) as conn:
+            value = func(self._get(conn, node_name, default))
+            self._put(conn, {node_name: value})
+        return value
+
+    def snapshot(self):
+        """获取共享命名空间内的所有变量"""
+        rows = self._conn.execute('SELECT name, value FROM variables WHERE namespace=?',
+                                  (SHARED_NAMESPACE,)).fetchall()
+        return {name: json.loads(value) for name, value in rows}
+
+    def clear(self):
+        """
+        清空变量和快照文件
+        功能：清空当前worker的场景变量；共享变量按xdist的运行ID只清空一次，
+             后启动的worker不会清掉先启动的worker已经提取的变量
+        """
+        run_id = os.environ.get('PYTEST_XDIST_TESTRUNUID')
+        with self._transaction(immediate=True) as conn:
+            conn.execute('DELETE FROM variables WHERE namespace LIKE ?', (self.namespace + ':%',))
+            row = conn.execute('SELECT value FROM variables WHERE namespace=? AND name=?',
+                               (RUN_NAMESPACE, 'run_id')).fetchone()
+            if run_id is None or row is None or json.loads(row[0]) != run_id:
+                conn.execute('DELETE FROM variables WHERE namespace=?', (SHARED_NAMESPACE,))
+                conn.execute('INSERT OR REPLACE INTO variables (namespace, name, value) VALUES (?, ?, ?)',
+                             (RUN_NAMESPACE, 'run_id', json.dumps(run_id)))
+        with open(self.file_path, 'w') as f:
+            f.truncate()
+
+    def flush(self):
+        """将当前worker的变量快照原子地写入快照文件"""
+        tmp_path = self.file_path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as wf:
+                yaml.dump(self.snapshot(), wf, allow_unicode=True, sort_keys=False)
+            os.replace(tmp_path, self.file_path)
+        except Exception:
+            logs.error(str(traceback.format_exc()))
+
+    def checkpoint(self):
+        """检查点：变量已实时落库，将WAL中的数据合并回主库，PASSIVE模式不等待其他进程"""
+        self._conn.execute('PRAGMA wal_checkpoint(PASSIVE)')
+
+
+def create_variable_context(store=setting.EXTRACT_STORE):
+    """
+    根据配置创建变量上下文
+
+    Args:
+        store (str): memory、sqlite或auto，auto在pytest-xdist worker进程中使用sqlite
+
+    Returns:
+        VariableContext或SqliteVariableContext
+    """
+    if store == 'sqlite' or (store == 'auto' and current_worker() != 'master'):
+        return SqliteVariableContext()
+    return VariableContext()
+
+
+# 测试会话内共享的变量上下文
+variable_context = create_variable_context()
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+YAML用例收集插件
+功能：通过pytest_collect_file直接收集testcase目录下的*.yaml/*.yml用例文件，无需为每个YAML文件编写test_*.py
+用法：pytest --yaml-cases ./testcase --ignore-glob="*/test_*.py"
+说明：
+1. 收集阶段只用正则扫描文件中的case_name/api_name生成用例，不解析YAML
+2. 文件中第一条用例即将执行时才解析该文件，本进程中该文件的用例全部执行完后（或下一条用例属于其他文件时）
+   释放解析结果，并删除执行计划缓存和模板缓存中引用该文件YAML节点的条目
+3. 单接口文件（一个baseInfo）每条testCase生成一条用例，业务场景文件（多个baseInfo）每个接口生成一条用例
+"""
+
+import os
+import re
+
+import allure
+import pytest
+
+from base.caseplan import plan_cache
+from common.readyaml import get_testcase_yaml
+from common.template import template_cache
+from conf.setting import DIR_BASE
+
+# 用例目录
+YAML_CASE_DIR = os.path.join(DIR_BASE, 'testcase')
+CASE_NAME_PATTERN = re.compile(r'^\s*-?\s*case_name\s*:\s*(.*?)\s*$', re.M)
+BASE_INFO_PATTERN = re.compile(r'^-\s*baseInfo\s*:', re.M)
+API_NAME_PATTERN = re.compile(r'^\s+api_name\s*:\s*(.*?)\s*$', re.M)
+
+
+def pytest_addoption(parser):
+    parser.addoption('--yaml-cases', action='store_true', default=False,
+                     help='直接收集testcase目录下的YAML用例文件，建议配合--ignore-glob="*/test_*.py"避免重复执行')
+
+
+def pytest_collect_file(parent, file_path):
+    if not parent.config.getoption('yaml_cases'):
+        return None
+    if file_path.suffix not in ('.yaml', '.yml'):
+        return None
+    if not os.path.abspath(str(file_path)).startswith(YAML_CASE_DIR + os.sep):
+        return None
+    return YamlCaseFile.from_parent(parent, path=file_path)
+
+
+@pytest.hookimpl(trylast=True)
+def pytest_collection_modifyitems(session, config, items):
+    """按取消选择（-k/-m/--deselect）后实际执行的用例统计每个YAML文件的待执行用例数"""
+    counts = {}
+    for item in items:
+        if isinstance(item.parent, YamlCaseFile):
+            counts[item.parent] = counts.get(item.parent, 0) + 1
+    for case_file, count in counts.items():
+        case_file._remaining = count
+
+
+def pytest_runtest_teardown(item, nextitem):
+    """
+    用例执行完后倒数文件的待执行用例数，数到0或下一条用例不属于该文件时释放解析结果
+    xdist的worker只执行分配给它的部分用例，待分配用例时nextitem为None，释放后再执行到该文件的用例时重新解析
+    """
+    case_file = item.parent
+    if not isinstance(case_file, YamlCaseFile):
+        return
+    case_file._remaining -= 1
+    if case_file._remaining <= 0 or nextitem is None or nextitem.parent is not case_file:
+        case_file.release()
+
+
+class YamlCaseFile(pytest.File):
+    """
+    YAML用例文件节点
+    功能：扫描用例名称生成用例，按需解析文件并在文件内用例执行完后释放
+    """
+
+    def collect(self):
+        text = self.path.read_text(encoding='utf-8')
+        self.scenario = len(BASE_INFO_PATTERN.findall(text)) > 1
+        names = (API_NAME_PATTERN if self.scenario else CASE_NAME_PATTERN).findall(text)
+        self._data = None
+        self._remaining = len(names)
+        for index, name in enumerate(names):
+            yield pytest.Function.from_parent(self, name='%s[%d]' % (name.strip('\'"'), index),
+                                              callobj=self._case_runner(index))
+
+    def _case_runner(self, index):
+        def run_yaml_case():
+            self.run_case(index)
+        return run_yaml_case
+
+    def load(self):
+        """执行文件内的用例时解析YAML，已释放时重新解析"""
+        if self._data is None:
+            self._data = get_testcase_yaml(str(self.path))
+            if not self._data:
+                raise ValueError('[%s]解析失败或没有测试用例' % self.path)
+        return self._data
+
+    def release(self):
+        """释放解析结果，并删除缓存中引用该文件YAML节点的执行计划和模板"""
+        if self._data is None:
+            return
+        node_ids = set()
+        stack = [self._data]
+        while stack:
+            node = stack.pop()
+            node_ids.add(id(node))
+            stack.extend(value for value in (node.values() if isinstance(node, dict) else node)
+                         if isinstance(value, (dict, list, tuple)))
+        plan_cache.discard(node_ids)
+        template_cache.discard(node_ids)
+        self._data = None
+
+    def run_case(self, index):
+        """
+        执行文件中的第index条用例
+
+        Args:
+            index (int): 用例序号
+        """
+        data = self.load()
+        if index >= len(data):
+            raise IndexError('[%s]第%d条用例不存在，请检查case_name是否与testCase一一对应' % (self.path, index))
+        allure.dynamic.feature(self.path.parent.name)
+        allure.dynamic.story(self.path.stem)
+        if self.scenario:
+            from base.apiutil_business import RequestBase
+            case_info = data[index]
+            allure.dynamic.title(case_info['baseInfo']['api_name'])
+            RequestBase().specification_yaml(case_info)
+        else:
+            from base.apiutil import RequestBase
+            base_info, testcase = data[index]
+            allure.dynamic.title(testcase['case_name'])
+            RequestBase().specification_yaml(base_info, testcase)
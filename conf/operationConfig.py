@@ -4,7 +4,10 @@
 功能：封装读取和操作*.ini配置文件的功能
 """
 
+import os
 import sys
+import threading
+import time
 import traceback
 import configparser
 from conf import setting
@@ -15,8 +18,23 @@ class OperationConfig:
     """
     配置文件操作类
     功能：封装读取和操作*.ini配置文件的功能，提供各种配置项的读取方法
+    说明：同一个配置文件在进程内只有一个实例，各section解析为普通字典缓存，
+         配置文件修改时间变化后才重新解析（最多每CONFIG_RELOAD_INTERVAL秒检查一次）
     """
 
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __new__(cls, filepath=None):
+        path = os.path.abspath(setting.FILE_PATH['CONFIG'] if filepath is None else filepath)
+        with cls._instances_lock:
+            instance = cls._instances.get(path)
+            if instance is None:
+                instance = super().__new__(cls)
+                instance._initialized = False
+                cls._instances[path] = instance
+        return instance
+
     def __init__(self, filepath=None):
         """
         初始化OperationConfig类
@@ -24,19 +42,74 @@ class OperationConfig:
         Args:
             filepath (str, optional): 配置文件路径，默认使用setting中配置的路径
         """
+        if self._initialized:
+            return
         if filepath is None:
             self.__filepath = setting.FILE_PATH['CONFIG']
         else:
             self.__filepath = filepath
 
+        self._lock = threading.RLock()
+        self._mtime = None
+        self._checked_at = 0
+        self._sections = {}
         self.conf = configparser.ConfigParser()
-        try:
-            self.conf.read(self.__filepath, encoding='utf-8')
-        except Exception as e:
-            exc_type, exc_value, exc_obj = sys.exc_info()
-            logs.error(str(traceback.print_exc(exc_obj)))
+        self.reload()
+        self._initialized = True
+
+    def reload(self):
+        """
+        重新读取配置文件
+        功能：解析ini文件并将每个section缓存为字典
+        """
+        with self._lock:
+            conf = configparser.ConfigParser()
+            try:
+                self._mtime = os.stat(self.__filepath).st_mtime_ns
+                conf.read(self.__filepath, encoding='utf-8')
+            except Exception as e:
+                exc_type, exc_value, exc_obj = sys.exc_info()
+                logs.error(str(traceback.print_exc(exc_obj)))
+            self.conf = conf
+            self._sections = {section: self._read_section(conf, section) for section in conf.sections()}
+            self._checked_at = time.monotonic()
+            self.type = self._sections.get('REPORT_TYPE', {}).get('type', '')
+
+    @staticmethod
+    def _read_section(conf, section):
+        """
+        读取一个section的所有配置项
+        功能：值中含有无法插值的%（如数据库、SSH密码）时只影响该配置项，记录错误后保留原始值
+
+        Args:
+            conf (ConfigParser): 已读取的配置
+            section (str): section名称
+
+        Returns:
+            dict: 配置项字典
+        """
+        values = {}
+        for option in conf.options(section):
+            try:
+                values[option] = conf.get(section, option)
+            except configparser.InterpolationError as e:
+                logs.error('配置项[%s]%s解析失败，使用原始值：%s', section, option, e)
+                values[option] = conf.get(section, option, raw=True)
+        return values
 
-        self.type = self.get_report_type('type')
+    def _check_reload(self):
+        """配置文件修改时间变化时重新读取"""
+        now = time.monotonic()
+        if now - self._checked_at < setting.CONFIG_RELOAD_INTERVAL:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.stat(self.__filepath).st_mtime_ns
+        except OSError:
+            return
+        if mtime != self._mtime:
+            logs.info('配置文件已修改，重新读取：%s', self.__filepath)
+            self.reload()
 
     def get_item_value(self, section_name):
         """
@@ -49,8 +122,8 @@ class OperationConfig:
         Returns:
             dict: 以字典形式返回的配置项
         """
-        items = self.conf.items(section_name)
-        return dict(items)
+        self._check_reload()
+        return dict(self._sections[section_name])
 
     def get_section_for_data(self, section, option):
         """
@@ -64,13 +137,91 @@ class OperationConfig:
         Returns:
             str: 配置项的值
         """
+        self._check_reload()
         try:
-            values = self.conf.get(section, option)
-            return values
+            return self._sections[section][option.lower()]
         except Exception as e:
             logs.error(str(traceback.format_exc()))
             return ''
 
+    def _get_typed(self, section, option, default, convert, type_name):
+        """
+        获取配置项并转换类型，配置项不存在或无法转换时返回默认值
+        只有未指定默认值时才记录错误，指定了默认值的可选配置项缺失时不记录日志
+
+        Args:
+            section (str): ini文件的section名称
+            option (str): section下的配置项名称
+            default: 默认值，为None表示必填
+            convert (callable): 类型转换函数，无法转换时抛出ValueError
+            type_name (str): 类型名称，用于日志
+
+        Returns:
+            转换后的值或默认值
+        """
+        self._check_reload()
+        value = self._sections.get(section, {}).get(option.lower())
+        if value is None:
+            if default is None:
+                logs.error('配置项[%s]%s不存在', section, option)
+            return default
+        try:
+            return convert(value)
+        except ValueError:
+            if default is None:
+                logs.error('配置项[%s]%s不是%s：%s', section, option, type_name, value)
+            return default
+
+    @staticmethod
+    def _to_bool(value):
+        """将1/0、true/false、yes/no、on/off转换为布尔值"""
+        try:
+            return configparser.ConfigParser.BOOLEAN_STATES[value.strip().lower()]
+        except KeyError:
+            raise ValueError(value)
+
+    def get_int(self, section, option, default=None):
+        """
+        获取整数类型的配置项，如端口、超时时间
+
+        Args:
+            section (str): ini文件的section名称
+            option (str): section下的配置项名称
+            default (int, optional): 配置项不存在或不是整数时的默认值，未指定时记录错误并返回None
+
+        Returns:
+            int: 配置项的值
+        """
+        return self._get_typed(section, option, default, int, '整数')
+
+    def get_float(self, section, option, default=None):
+        """
+        获取浮点数类型的配置项
+
+        Args:
+            section (str): ini文件的section名称
+            option (str): section下的配置项名称
+            default (float, optional): 配置项不存在或不是数字时的默认值，未指定时记录错误并返回None
+
+        Returns:
+            float: 配置项的值
+        """
+        return self._get_typed(section, option, default, float, '数字')
+
+    def get_bool(self, section, option, default=False):
+        """
+        获取布尔类型的配置项，支持1/0、true/false、yes/no、on/off
+
+        Args:
+            section (str): ini文件的section名称
+            option (str): section下的配置项名称
+            default (bool): 配置项不存在或无法识别时的默认值，传None时记录错误并返回None
+
+        Returns:
+            bool: 配置项的值
+        """
+        return self._get_typed(section, option, default, self._to_bool, '布尔值')
+
     def write_config_data(self, section, option_key, option_value):
         """
         写入数据到ini配置文件
@@ -89,9 +240,11 @@ class OperationConfig:
             self.conf.add_section(section)
             self.conf.set(section, option_key, option_value)
         else:
-            logs.info('"%s"值已存在，写入失败' % section)
-        with open(self.__filepath, 'w', encoding='utf-8') as f:
-            self.conf.write(f)
+            logs.info('"%s"值已存在，写入失败', section)
+        with self._lock:
+            with open(self.__filepath, 'w', encoding='utf-8') as f:
+                self.conf.write(f)
+            self.reload()
 
     def get_section_mysql(self, option):
         """
@@ -14,16 +14,83 @@ sys.path.append(DIR_BASE)
 
 # 日志配置
 LOG_LEVEL = logging.DEBUG        # 文件日志输出级别
-STREAM_LOG_LEVEL = logging.DEBUG  # 控制台日志输出级别
+STREAM_LOG_LEVEL = logging.INFO  # 控制台日志输出级别
+LOG_ASYNC = True  # 是否由后台线程写日志，True时请求线程只把日志放入队列，不做格式化和磁盘IO
+LOG_QUEUE_SIZE = 10000  # 日志队列最大长度，队列已满时丢弃日志并计数，不阻塞请求线程
+LOG_RETENTION_DAYS = 30  # 日志最多保留天数，每天第一次导入日志模块时在后台清理一次
+LOG_RETENTION_MAX_MB = 500  # 历史日志（不含当天正在写入的日志）最大总大小，单位：MB，超过后从最旧的日志开始删除
+LOG_COMPRESS = True  # 是否gzip压缩滚动备份和往日的日志
+
+# 结构化日志配置：每个事件一行JSON，包含用例ID、接口名称、阶段、耗时、状态和报文大小，写入logs/events.日期.jsonl
+STRUCTURED_LOG = False  # 是否启用结构化日志，启用后可将LOG_LEVEL调高为WARNING以减少文本日志量
+STRUCTURED_LOG_BODY_ON_FAILURE = True  # 用例失败时是否记录完整的请求和响应报文
+STRUCTURED_LOG_SAMPLE_RATE = 0.01  # 成功用例记录完整报文的抽样比例，0表示不记录
+STRUCTURED_LOG_BODY_LIMIT = 65536  # 单个报文最多记录的字符数
 
 # 接口配置
 API_TIMEOUT = 60  # 接口超时时间，单位：秒
+JSON_BACKEND = 'auto'  # 响应体JSON解析库：auto已安装orjson时使用orjson，json使用标准库，orjson强制使用orjson
+
+# HTTP连接池配置（同一host的所有用例共享一个会话，复用TCP/TLS连接）
+POOL_CONNECTIONS = 10  # 每个会话缓存的host连接池数量
+POOL_MAXSIZE = 20  # 每个host连接池保留的最大连接数
+POOL_KEEP_ALIVE = True  # 是否启用keep-alive长连接，False时每次请求后关闭连接
+POOL_MAX_IDLE = 60  # 会话最大空闲时间，单位：秒，超过后关闭并重建会话
+
+# 异步执行引擎配置
+ASYNC_MAX_PER_HOST = 10  # 每个host同时发送的最大请求数，不宜超过POOL_MAXSIZE
+ASYNC_MAX_WORKERS = 32  # 发送请求的线程池大小
+ASYNC_READ_ONLY_SUITES = False  # 只读查询用例（商品列表、商品详情）是否由异步执行引擎并发执行，True时跳过对应的逐条执行用例
+
+# 接口关联数据配置
+EXTRACT_FLUSH_INTERVAL = 0  # 每写入多少次提取数据后保存一次extract.yaml，0表示只在检查点和测试会话结束时保存
+EXTRACT_STORE = 'auto'  # 关联数据存储方式：memory内存、sqlite多进程共享，auto在pytest-xdist多进程运行时使用sqlite
+
+# YAML占位符函数配置
+DEBUGTALK_MODULES = []  # 项目自定义函数模块路径，如['data.project_funcs']，模块中的公开函数可在YAML中以${函数名()}调用
+DEBUGTALK_CACHE_SIZE = 1024  # md5、sha1、base64等纯函数的LRU缓存大小
+
+# 配置文件检查间隔，单位：秒，config.ini修改时间变化后自动重新读取
+CONFIG_RELOAD_INTERVAL = 1
+
+# YAML用例解析缓存配置，按文件路径、修改时间和内容哈希缓存解析结果，加快用例收集
+CASE_CACHE_ENABLED = True
+
+# MySQL连接池配置
+MYSQL_POOL_MAXSIZE = 5  # 最大连接数
+MYSQL_POOL_IDLE_TIMEOUT = 300  # 连接最大空闲时间，单位：秒，超过后关闭
+MYSQL_POOL_WAIT_TIMEOUT = 10  # 连接用完时的最长等待时间，单位：秒
+MYSQL_POOL_PING_INTERVAL = 30  # 连接空闲超过该时间后，借出前先ping检查，单位：秒
+MYSQL_STREAM_BATCH_SIZE = 1000  # 流式查询每次从服务端读取的行数
+
+# ClickHouse连接配置，同一个连接地址在进程内共享一个引擎和连接池
+CLICKHOUSE_POOL_SIZE = 10  # 连接池大小
+CLICKHOUSE_POOL_TIMEOUT = 20  # 获取连接的最长等待时间，单位：秒
+CLICKHOUSE_CHUNK_SIZE = 100000  # 流式查询每块的行数
+
+# MongoDB批量操作配置
+MONGO_BATCH_SIZE = 1000  # 批量写入每次请求的条数，流式查询每次从服务端读取的条数
+
+# Redis连接配置，相同连接参数在进程内共享一个连接池
+REDIS_MAX_CONNECTIONS = 50  # 连接池最大连接数
+REDIS_BATCH_SIZE = 500  # mget每次请求的key数量，SCAN每次遍历的数量提示
+
+# SSH连接配置
+SSH_KEEPALIVE = 30  # 连接保活心跳间隔，单位：秒
+SSH_MAX_WORKERS = 8  # 多台服务器并发执行命令的线程数
+SSH_READ_TIMEOUT = None  # 读取命令输出的超时时间，单位：秒，None表示不限制（config.ini中的timeout只用于建立连接）
 
 # Excel文件配置
 SHEET_ID = 0  # Excel文件的sheet页索引，默认读取第一个sheet页（0表示第一个）
 
 # 测试报告配置
 REPORT_TYPE = 'allure'  # 生成的测试报告类型，支持'allure'或'tm'
+# Allure附件策略：full每项信息单独一个附件；lean每条用例合并为一个附件，成功用例的报文按ALLURE_ATTACH_MAX_BYTES截断，
+# 失败用例保留完整报文；off不写附件，用于性能测试
+ALLURE_ATTACH_MODE = 'full'
+ALLURE_ATTACH_MAX_BYTES = 8192  # lean模式下成功用例每段报文保留的最大字节数
+ALLURE_ATTACH_DEDUP = True  # 附件按内容哈希命名，同一进程内内容相同的附件只写一个文件
+ALLURE_ATTACH_GZIP_BYTES = 0  # 超过该字节数的附件gzip压缩后保存（报告中以下载方式查看），0表示不压缩
 
 # 通知配置
 dd_msg = False  # 是否发送钉钉消息通知
@@ -36,8 +103,10 @@ FILE_PATH = {
     'TEMP': os.path.join(DIR_BASE, 'report/temp'),            # 临时报告目录
     'TMR': os.path.join(DIR_BASE, 'report/tmreport'),         # TM报告目录
     'EXTRACT': os.path.join(DIR_BASE, 'extract.yaml'),        # 数据提取文件
+    'EXTRACT_DB': os.path.join(DIR_BASE, 'extract.db'),       # 多进程共享的数据提取库
     'XML': os.path.join(DIR_BASE, 'data/sql'),                # SQL文件目录
     'RESULTXML': os.path.join(DIR_BASE, 'report'),            # 结果报告目录
+    'CASE_CACHE': os.path.join(DIR_BASE, 'report', '.case_cache'),  # YAML用例解析缓存目录
     'EXCEL': os.path.join(DIR_BASE, 'data', '测试数据.xls')   # Excel测试数据文件
 }
 
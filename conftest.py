@@ -7,7 +7,14 @@ pytest全局配置文件
 import time
 import pytest
 
-from common.readyaml import ReadYamlData
+from common.allureattach import attach_policy
+from common.readyaml import ReadYamlData, case_cache
+from common.recordlog import apilog, logs, event_log
+from common.sendrequest import session_pool
+from common.variablecontext import variable_context
+
+# YAML用例收集插件，使用--yaml-cases启用
+pytest_plugins = ['common.yamlplugin']
 
 
 def generate_test_summary(terminalreporter):
@@ -58,6 +65,67 @@ def generate_test_summary(terminalreporter):
     return summary
 
 
+def pytest_collection_finish(session):
+    """用例收集完成后输出YAML用例解析缓存的命中情况"""
+    logs.info("YAML用例解析缓存统计：%s", case_cache.stats())
+
+
+def pytest_sessionfinish(session, exitstatus):
+    """测试会话结束时等待后台日志清理完成"""
+    apilog.wait_retention()
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    """保存用例各阶段的执行结果，供结构化日志记录用例状态"""
+    outcome = yield
+    report = outcome.get_result()
+    setattr(item, 'rep_' + report.when, report)
+
+
+@pytest.fixture(autouse=True)
+def case_trace(request):
+    """
+    结构化日志用例追踪fixture
+    功能：为每条用例生成case_id，用例内的请求、响应、断言事件共享该ID，用例结束时记录状态和耗时
+    作用域：function（每个测试函数都会执行）
+    """
+    token = event_log.start_case(request.node.nodeid)
+    yield
+    report = getattr(request.node, 'rep_call', None) or getattr(request.node, 'rep_setup', None)
+    event_log.end_case(token, report.outcome if report is not None else 'error')
+
+
 @pytest.fixture(scope="session", autouse=True)
 def clear_data():
+    """
+    接口关联数据fixture
+    功能：测试会话开始时清空extract.yaml，结束时将内存中的变量快照保存到extract.yaml
+    作用域：session（整个测试会话只执行一次）
+    """
     ReadYamlData.clear_yaml_data(self=None)
+    yield
+    variable_context.flush()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def http_session_pool():
+    """
+    HTTP会话连接池fixture
+    功能：测试会话结束后输出连接池命中统计并关闭所有共享连接
+    作用域：session（整个测试会话只执行一次）
+    """
+    yield session_pool
+    logs.info("HTTP连接池统计：%s", session_pool.stats())
+    session_pool.close()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def allure_attachment_store():
+    """
+    Allure附件存储fixture
+    功能：测试会话结束后输出附件写入文件数、内容相同而复用的次数和少写的字节数
+    作用域：session（整个测试会话只执行一次）
+    """
+    yield attach_policy.store
+    logs.info("Allure附件存储统计：%s", attach_policy.store.stats())
@@ -9,7 +9,9 @@ import pytest
 
 from base.generateId import m_id, c_id
 from base.apiutil import RequestBase
+from base.apiutil_async import AsyncRequestBase
 from common.readyaml import get_testcase_yaml
+from conf.setting import ASYNC_READ_ONLY_SUITES
 
 
 @allure.feature(next(m_id) + '商品管理（单接口）')
@@ -21,6 +23,7 @@ class TestLogin:
 
     @allure.story(next(c_id) + "获取商品列表")
     @pytest.mark.run(order=1)
+    @pytest.mark.skipif(ASYNC_READ_ONLY_SUITES, reason='由test_query_products_async并发执行')
     @pytest.mark.parametrize('base_info,testcase', get_testcase_yaml('./testcase/ProductManager/getProductList.yaml'))
     def test_get_product_list(self, base_info, testcase):
         """
@@ -32,6 +35,7 @@ class TestLogin:
 
     @allure.story(next(c_id) + "获取商品详情信息")
     @pytest.mark.run(order=2)
+    @pytest.mark.skipif(ASYNC_READ_ONLY_SUITES, reason='由test_query_products_async并发执行')
     @pytest.mark.parametrize('base_info,testcase', get_testcase_yaml('./testcase/ProductManager/productDetail.yaml'))
     def test_get_product_detail(self, base_info, testcase):
         """
@@ -41,6 +45,17 @@ class TestLogin:
         allure.dynamic.title(testcase['case_name'])
         RequestBase().specification_yaml(base_info, testcase)
 
+    @allure.story(next(c_id) + "商品列表和商品详情（并发执行）")
+    @pytest.mark.run(order=2)
+    @pytest.mark.skipif(not ASYNC_READ_ONLY_SUITES, reason='未启用ASYNC_READ_ONLY_SUITES')
+    def test_query_products_async(self):
+        """
+        并发执行商品列表和商品详情的只读查询用例
+        功能：相互独立的用例并发发送，含extract_list的商品列表用例执行完成后再执行依赖goodsId的商品详情用例
+        """
+        AsyncRequestBase().run_cases(get_testcase_yaml('./testcase/ProductManager/getProductList.yaml') +
+                                     get_testcase_yaml('./testcase/ProductManager/productDetail.yaml'))
+
     # @allure.story('检查接口状态')
     # @pytest.mark.parametrize('params', get_testcase_yaml('./testcase/productManager/apiType.yaml'))
     # def test_get_api_type(self, params):
@@ -9,7 +9,7 @@ import allure
 from common.readyaml import get_testcase_yaml
 from base.apiutil import RequestBase
 from common.recordlog import logs
-from common.connection import ConnectMysql
+from common.connection import ConnectMysql, mysql_pool, dispose_clickhouse_engines, ssh_pool
 
 """
 pytest fixture作用域说明：
@@ -47,7 +47,7 @@ def system_login():
         api_info = get_testcase_yaml('./data/loginName.yaml')
         RequestBase().specification_yaml(api_info[0][0], api_info[0][1])
     except Exception as e:
-        logs.error(f'登录接口出现异常，导致后续接口无法继续运行，请检查程序！，{e}')
+        logs.error('登录接口出现异常，导致后续接口无法继续运行，请检查程序！，%s', e)
         exit()
 
 
@@ -59,11 +59,15 @@ def datadb_init():
     说明：数据库可以预先预置一批本次测试的数据，在测试完成之后将这批数据清理，
          就不会对系统造成影响，也不会产生脏数据
     作用域：session（整个测试会话只执行一次）
+    连接池：ConnectMysql、数据库断言共用同一个连接池，会话结束时输出连接池统计并关闭MySQL、ClickHouse和SSH连接
     """
-    # conn = ConnectMysql()
-    # yield
-    # sql = "delete from sys_user where login_name='test999'"
-    # conn.delete(sql)
+    # with ConnectMysql() as conn:
+    #     conn.execute("insert into sys_user(login_name) values('test999')")
+    yield mysql_pool
+    # with ConnectMysql() as conn:
+    #     conn.delete("delete from sys_user where login_name='test999'")
     # allure.attach('将测试数据清空', 'fixture后置', allure.attachment_type.TEXT)
-
-    pass
+    logs.info("MySQL连接池统计：%s", mysql_pool.stats())
+    mysql_pool.close()
+    dispose_clickhouse_engines()
+    ssh_pool.close()